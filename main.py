@@ -1,7 +1,59 @@
 from src.staging.staging_pipeline import Staging_Pipeline
 from src.warehouse.warehouse_pipeline import Warehouse_Pipeline
 from src.modelling.modelling_pipeline import Modelling_Pipeline
+from src.utils.engine import connection_stats, dispose_engines
+from src.utils.load_log import shutdown_log
+from src.utils.dag import DAG, Task, table_fingerprint
+import sys
+
+
+def _stage(table_name: str):
+    def run():
+        report = Staging_Pipeline(tables=[table_name])
+        failed = [name for name, task in report.items() if task["status"] != "success"]
+        if failed:
+            raise Exception(f"{', '.join(failed)} failed")
+
+    return run
+
+
+def _required(name: str, func, *args, **kwargs):
+    """
+    The warehouse and modelling pipelines log their failures and return False instead of
+    raising, the DAG only sees a failure when it raises
+    """
+    def run():
+        if not func(*args, **kwargs):
+            raise Exception(f"{name} failed")
+
+    return run
+
+
+def build_dag() -> DAG:
+    staging_tables = ["car_sales", "car_brand", "us_state"]
+
+    return DAG([
+        # The spreadsheet and the API have no cheap fingerprint, so they are always staged
+        Task("staging car_sales", _stage("car_sales"),
+             fingerprint=lambda: table_fingerprint("source", "car_sales")),
+        Task("staging car_brand", _stage("car_brand")),
+        Task("staging us_state", _stage("us_state")),
+
+        # Profiling and transform share one extract of staging car_sales
+        Task("warehouse", _required("Warehouse_Pipeline", Warehouse_Pipeline, profile=True, transform=True),
+             deps=[f"staging {table}" for table in staging_tables],
+             fingerprint=lambda: [table_fingerprint("staging", table) for table in staging_tables]),
+
+        Task("modelling", _required("Modelling_Pipeline", Modelling_Pipeline),
+             deps=["warehouse"],
+             fingerprint=lambda: table_fingerprint("warehouse", "car_sales")),
+    ])
+
+
 if __name__ == "__main__":
-    Staging_Pipeline()
-    Warehouse_Pipeline()
-    Modelling_Pipeline()
+    # --force runs every task even if its inputs haven't changed since the last run
+    build_dag().run(force="--force" in sys.argv)
+
+    shutdown_log()
+    print(f"Database connections opened: {connection_stats()}")
+    dispose_engines()
@@ -4,15 +4,20 @@ from sklearn.preprocessing import StandardScaler
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_squared_error, r2_score
 from sklearn.model_selection import GridSearchCV
+from scipy import sparse as sp
 import numpy as np
 from datetime import datetime
 import joblib
+import json
 import os
 from minio import Minio
 from src.utils.load_log import LOAD_LOG
+from src.utils.categorical import is_categorical, compact_categorical
+from src.modelling.load_model import file_sha256, manifest_name, compiled_name
+from src.modelling.compiled_forest import CompiledForest
 
 class CarPriceModel:
-    def __init__(self, data: pd.DataFrame) -> None:
+    def __init__(self, data: pd.DataFrame, sparse: bool = None) -> None:
         """
         Initialize the car price prediction model
         
@@ -20,8 +25,15 @@ class CarPriceModel:
         -----------
         data : pd.DataFrame
             DataFrame containing car data
+        sparse : bool, default=None
+            One-hot encode into a SciPy sparse matrix and scale only the numeric features
+            (SPARSE_ENCODING environment variable if None)
         """
         self.data = data
+        self.sparse = os.getenv("SPARSE_ENCODING", "false").lower() == "true" if sparse is None else sparse
+        self.vocabulary = None
+        self.numeric_features = None
+        self.feature_names = None
         self.features = ['odometer_log', 'condition', 'car_age', 'brand_car_id', 'transmission', 'color', 'mmr']
         self.target = 'selling_price'
         self.model = None
@@ -73,13 +85,68 @@ class CarPriceModel:
             # Save the log
             LOAD_LOG(log_msg)
     
+    def _compact_features(self, data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Feature columns, with the dictionary-encoded ones reduced to their used categories
+        so get_dummies creates the same columns as for plain strings
+        """
+        features = data[self.features]
+
+        compacted = {col: compact_categorical(features[col]) for col in self.features if is_categorical(features[col])}
+        if compacted:
+            features = features.assign(**compacted)
+
+        return features
+
+    def _sparse_encode(self, data: pd.DataFrame, fit: bool = False):
+        """
+        Numeric features and a sparse one-hot matrix of the categorical ones, with the same
+        columns as get_dummies(drop_first=True). fit=True learns the category vocabulary,
+        afterwards unknown categories are encoded as all zeros.
+
+        Returns:
+        --------
+        tuple
+            (numeric features DataFrame, one-hot scipy.sparse.csr_matrix)
+        """
+        features = data[self.features]
+
+        if fit:
+            categorical = [col for col in self.features
+                           if is_categorical(features[col]) or not pd.api.types.is_numeric_dtype(features[col])]
+            self.numeric_features = [col for col in self.features if col not in categorical]
+
+            # Sorted categories without the first one, like drop_first
+            self.vocabulary = {col: sorted(features[col].dropna().astype(str).unique())[1:] for col in categorical}
+            self.feature_names = self.numeric_features + [f"{col}_{value}" for col, values in self.vocabulary.items()
+                                                          for value in values]
+
+        rows, columns = [], []
+        offset = 0
+        for col, values in self.vocabulary.items():
+            codes = pd.Index(values).get_indexer(features[col].astype(str))
+            known = np.flatnonzero(codes >= 0)
+
+            rows.append(known)
+            columns.append(codes[known] + offset)
+            offset += len(values)
+
+        rows = np.concatenate(rows) if rows else np.array([], dtype=np.int64)
+        columns = np.concatenate(columns) if columns else np.array([], dtype=np.int64)
+        onehot = sp.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, columns)), shape=(len(features), offset))
+
+        return features[self.numeric_features], onehot
+
     def prepare_data(self):
         """
         Prepare data for modeling, including encoding categorical features
         """
         try:
             # One-hot encoding for categorical variables
-            self.X_encoded = pd.get_dummies(self.data[self.features], drop_first=True)
+            if self.sparse:
+                self.X_encoded = self._sparse_encode(self.data, fit=True)
+            else:
+                self.X_encoded = pd.get_dummies(self._compact_features(self.data), drop_first=True)
             
             # Target is 'selling_price'
             self.y = self.data[self.target]
@@ -115,7 +182,12 @@ class CarPriceModel:
         """
         try:
 
-            self.X_scaled = self.scaler.fit_transform(self.X_encoded)
+            if self.sparse:
+                # Only the numeric columns are scaled, the one-hot part stays sparse
+                numeric, onehot = self.X_encoded
+                self.X_scaled = sp.hstack([sp.csr_matrix(self.scaler.fit_transform(numeric)), onehot], format="csr")
+            else:
+                self.X_scaled = self.scaler.fit_transform(self.X_encoded)
 
             log_msg = {
                 "step": "modelling",
@@ -358,17 +430,22 @@ class CarPriceModel:
                 X_copy['car_age'] = 2015 - X_copy['year']
                 X_copy['odometer_log'] = np.log1p(X_copy['odometer'])
                 
-                # One-hot encoding
-                X_encoded = pd.get_dummies(X_copy[self.features], drop_first=True)
-                
-                # Ensure all columns used during training are present
-                missing_cols = set(self.X_encoded.columns) - set(X_encoded.columns)
-                for col in missing_cols:
-                    X_encoded[col] = 0
-                X_encoded = X_encoded[self.X_encoded.columns]
-                
-                # Scaling
-                X_scaled = self.scaler.transform(X_encoded)
+                if self.sparse:
+                    # Sparse one-hot encoding with the training vocabulary, then scaling of the numeric part
+                    numeric, onehot = self._sparse_encode(X_copy)
+                    X_scaled = sp.hstack([sp.csr_matrix(self.scaler.transform(numeric)), onehot], format="csr")
+                else:
+                    # One-hot encoding
+                    X_encoded = pd.get_dummies(self._compact_features(X_copy), drop_first=True)
+
+                    # Ensure all columns used during training are present
+                    missing_cols = set(self.X_encoded.columns) - set(X_encoded.columns)
+                    for col in missing_cols:
+                        X_encoded[col] = 0
+                    X_encoded = X_encoded[self.X_encoded.columns]
+
+                    # Scaling
+                    X_scaled = self.scaler.transform(X_encoded)
             else:
                 # If X is already an array, directly transform
                 X_scaled = self.scaler.transform(X)
@@ -399,7 +476,8 @@ class CarPriceModel:
             LOAD_LOG(log_msg) 
     
     def store_model(self, model_filename="car_price_model.pkl", bucket_name="car-sales-modelling", 
-                    minio_host="localhost:9001", minio_access_key=None, minio_secret_key=None):
+                    minio_host="localhost:9001", minio_access_key=None, minio_secret_key=None,
+                    export_compiled=True):
         """
         Save the machine learning model to MinIO object storage
         
@@ -415,6 +493,10 @@ class CarPriceModel:
             Access key for MinIO authentication (if None, will be taken from environment variables)
         minio_secret_key : str, default=None
             Secret key for MinIO authentication (if None, will be taken from environment variables)
+        export_compiled : bool, default=True
+            Also upload the forest compiled to flat node arrays (CompiledForest), after checking
+            that it predicts the test set exactly like the sklearn model. If compiling or the
+            check fails, it is logged and only the compiled upload is skipped
             
         Returns:
         --------
@@ -446,7 +528,37 @@ class CarPriceModel:
             
             # Save the column information for one-hot encoding
             columns_filename = f"columns_{model_filename}.pkl"
-            joblib.dump(self.X_encoded.columns, columns_filename)
+            if self.sparse:
+                joblib.dump({"feature_names": self.feature_names, "numeric_features": self.numeric_features,
+                             "vocabulary": self.vocabulary}, columns_filename)
+            else:
+                joblib.dump(self.X_encoded.columns, columns_filename)
+
+            # Flat node arrays of the forest, for the compiled inference path
+            if export_compiled:
+                compiled_filename = f"compiled_{model_filename}"
+                try:
+                    compiled = CompiledForest.from_sklearn(self.model)
+                    max_difference = compiled.verify(self.model, self.X_test)
+                    print(f"Compiled forest matches the model on the test set (max difference {max_difference})")
+
+                    joblib.dump(compiled, compiled_filename)
+
+                except Exception as e:
+                    # The compiled forest is optional, the model is still stored without it
+                    print(f"Compiled forest not exported: {str(e)}")
+                    LOAD_LOG({
+                        "step": "modelling",
+                        "component": "Compile Forest",
+                        "status": "failed",
+                        "table_name": "car_price",
+                        "etl_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                        "error_msg": str(e)
+                    })
+
+                    export_compiled = False
+                    if os.path.exists(compiled_filename):
+                        os.remove(compiled_filename)
             
             # Initialize MinIO client
             print(f"Connecting to MinIO server: {minio_host}")
@@ -477,11 +589,30 @@ class CarPriceModel:
             # Upload column information to MinIO
             columns_version_filename = f"{current_date}_columns_{model_filename}"
             client.fput_object(bucket_name, columns_version_filename, columns_filename)
+
+            # Upload the compiled forest to MinIO
+            if export_compiled:
+                compiled_version_filename = compiled_name(current_date, model_filename)
+                client.fput_object(bucket_name, compiled_version_filename, compiled_filename)
+
+            # Upload the checksums the model loader verifies the downloads against
+            manifest_filename = manifest_name(current_date, model_filename)
+            checksums = {model_version_filename: file_sha256(model_filename),
+                         scaler_version_filename: file_sha256(scaler_filename),
+                         columns_version_filename: file_sha256(columns_filename)}
+            if export_compiled:
+                checksums[compiled_version_filename] = file_sha256(compiled_filename)
+            with open(manifest_filename, "w", encoding="utf-8") as f:
+                json.dump({"sha256": checksums}, f, indent=4)
+            client.fput_object(bucket_name, manifest_filename, manifest_filename)
             
             # Remove local files after upload
             os.remove(model_filename)
             os.remove(scaler_filename)
             os.remove(columns_filename)
+            os.remove(manifest_filename)
+            if export_compiled:
+                os.remove(compiled_filename)
             
             print("Model, scaler, and column information successfully saved to MinIO.")
 
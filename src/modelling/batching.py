@@ -0,0 +1,216 @@
+from concurrent.futures import Future
+from collections import deque
+from dotenv import load_dotenv
+import numpy as np
+import threading
+import queue
+import time
+import os
+
+load_dotenv()
+
+# A batch is scored as soon as it has BATCH_MAX_SIZE records, or BATCH_MAX_WAIT_MS after its first record arrived
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "64"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "2"))
+
+_STOP = object()
+
+
+class MicroBatcher:
+    def __init__(self, predict_fn, max_batch_size: int = None, max_wait_ms: float = None,
+                 window: int = 10000) -> None:
+        """
+        Collect single records from many callers into batches scored by one vectorized call,
+        and hand every caller back its own prediction.
+
+        Parameters:
+        -----------
+        predict_fn : callable
+            Takes a list of records and returns one prediction per record, e.g. Predictor.predict,
+            or lambda records: car_price_model.predict(pd.DataFrame(records))
+        max_batch_size : int, default=None
+            Maximum records per call of predict_fn, BATCH_MAX_SIZE if None
+        max_wait_ms : float, default=None
+            Maximum time the first record of a batch waits for more, BATCH_MAX_WAIT_MS if None
+        window : int, default=10000
+            Number of recent requests and batches the latency and batch size percentiles are computed over
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size or BATCH_MAX_SIZE
+        self.max_wait = (BATCH_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000
+
+        self.queue = queue.Queue()
+        self.closed = False
+
+        # Counters
+        self.lock = threading.Lock()
+        self.started_at = time.perf_counter()
+        self.requests = 0
+        self.batches = 0
+        self.failed = 0
+        self.predict_seconds = 0.0
+        self.latency_ms = deque(maxlen=window)
+        self.batch_sizes = deque(maxlen=window)
+
+        self.thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self.thread.start()
+
+    def submit(self, record) -> Future:
+        """
+        Queue one record, the returned Future resolves to its prediction
+        """
+        future = Future()
+
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("MicroBatcher is closed")
+            self.queue.put((record, future, time.perf_counter()))
+
+        return future
+
+    def predict(self, record, timeout: float = None):
+        return self.submit(record).result(timeout)
+
+    def _collect(self):
+        """
+        Block for the first record, then take more until the batch is full or max_wait has passed
+        """
+        item = self.queue.get()
+        if item is _STOP:
+            return None
+
+        batch = [item]
+        deadline = time.perf_counter() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            try:
+                # Records already waiting are taken without sleeping
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            if item is _STOP:
+                # Score what was collected, then stop
+                self.queue.put(_STOP)
+                break
+
+            batch.append(item)
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+
+            futures = [future for _, future, _ in batch]
+            try:
+                self._score(batch)
+            except BaseException as e:
+                # Whatever went wrong, no caller is left waiting on its future
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _predict(self, records) -> list:
+        """
+        Call predict_fn, raise unless it returned one prediction per record
+        """
+        predictions = self.predict_fn(records)
+
+        if predictions is None or isinstance(predictions, (str, bytes, dict)):
+            raise TypeError(f"predict_fn returned {type(predictions).__name__}, expected one prediction per record")
+
+        predictions = list(predictions)
+        if len(predictions) != len(records):
+            raise ValueError(f"predict_fn returned {len(predictions)} predictions for {len(records)} records")
+
+        return predictions
+
+    def _score(self, batch):
+        records = [record for record, _, _ in batch]
+        futures = [future for _, future, _ in batch]
+
+        start_time = time.perf_counter()
+        try:
+            results = [(prediction, None) for prediction in self._predict(records)]
+        except Exception:
+            # One invalid record fails the vectorized call, score one by one so only its caller gets the error
+            results = []
+            for record in records:
+                try:
+                    results.append((self._predict([record])[0], None))
+                except Exception as e:
+                    results.append((None, e))
+        end_time = time.perf_counter()
+
+        for future, (prediction, error) in zip(futures, results):
+            if error is None:
+                future.set_result(prediction)
+            else:
+                future.set_exception(error)
+
+        with self.lock:
+            self.requests += len(batch)
+            self.batches += 1
+            self.failed += sum(error is not None for _, error in results)
+            self.predict_seconds += end_time - start_time
+            self.batch_sizes.append(len(batch))
+            self.latency_ms.extend((end_time - submitted_at) * 1000 for _, _, submitted_at in batch)
+
+    def stats(self) -> dict:
+        """
+        Throughput and latency counters. latency is measured from submit() to the prediction
+        being available, so it includes the time spent waiting for the batch to fill.
+        """
+        with self.lock:
+            latency_ms = np.array(self.latency_ms)
+            batch_sizes = np.array(self.batch_sizes)
+            requests, batches, failed, predict_seconds = self.requests, self.batches, self.failed, self.predict_seconds
+
+        elapsed = time.perf_counter() - self.started_at
+        stats = {
+            "requests": requests,
+            "batches": batches,
+            "failed": failed,
+            "queued": self.queue.qsize(),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "mean_batch_size": round(requests / batches, 2) if batches else 0.0,
+            "requests_per_s": round(requests / elapsed, 2) if elapsed > 0 else 0.0,
+            # Records per second of predict_fn time, the capacity of the scoring thread
+            "predict_capacity_per_s": round(requests / predict_seconds, 2) if predict_seconds > 0 else 0.0,
+        }
+
+        if len(latency_ms):
+            p50, p99 = np.percentile(latency_ms, [50, 99])
+            stats["p50_ms"] = round(float(p50), 3)
+            stats["p99_ms"] = round(float(p99), 3)
+            stats["p50_batch_size"] = float(np.percentile(batch_sizes, 50))
+
+        return stats
+
+    def close(self):
+        """
+        Score the records already queued, then stop the batching thread
+        """
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.queue.put(_STOP)
+
+        self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,142 @@
+from scipy import sparse as sp
+import numpy as np
+
+# Upper bound of rows x trees node indices held at once by predict
+PREDICT_BLOCK_NODES = 1 << 20
+
+
+class CompiledForest:
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray, right: np.ndarray,
+                 missing_left: np.ndarray, value: np.ndarray, roots: np.ndarray, max_depth: int,
+                 n_features: int) -> None:
+        """
+        A RandomForestRegressor flattened into one set of node arrays. All trees are walked
+        together, one level per step, with numpy gathers instead of a Python call per tree.
+        Leaves point to themselves, so walking max_depth levels lands every row on its leaf.
+
+        Parameters:
+        -----------
+        feature, threshold : np.ndarray
+            Split of every node (a leaf has feature 0 and threshold +inf)
+        left, right : np.ndarray
+            Index of the children of every node in the flat arrays
+        missing_left : np.ndarray
+            Whether a missing value goes to the left child (sklearn missing value support)
+        value : np.ndarray
+            Prediction of every node, only read at the leaves
+        roots : np.ndarray
+            Index of the root node of every tree
+        """
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing_left = missing_left
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.n_features_in_ = n_features
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """
+        Compile a fitted RandomForestRegressor (single output)
+        """
+        if getattr(model, "n_outputs_", 1) != 1:
+            raise Exception("CompiledForest supports single output regressors only")
+
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+        index_dtype = np.int32 if offsets[-1] < np.iinfo(np.int32).max else np.int64
+
+        feature, threshold, left, right, missing_left, value = [], [], [], [], [], []
+        for tree, offset in zip(trees, offsets):
+            nodes = np.arange(tree.node_count)
+            leaf = tree.children_left == -1
+
+            feature.append(np.where(leaf, 0, tree.feature))
+            threshold.append(np.where(leaf, np.inf, tree.threshold))
+            left.append(np.where(leaf, nodes, tree.children_left) + offset)
+            right.append(np.where(leaf, nodes, tree.children_right) + offset)
+            missing_left.append(np.asarray(getattr(tree, "missing_go_to_left", np.zeros(tree.node_count)), dtype=bool))
+            value.append(tree.value[:, 0, 0])
+
+        return cls(feature=np.concatenate(feature).astype(np.int32),
+                   threshold=np.concatenate(threshold).astype(np.float64),
+                   left=np.concatenate(left).astype(index_dtype),
+                   right=np.concatenate(right).astype(index_dtype),
+                   missing_left=np.concatenate(missing_left),
+                   value=np.concatenate(value).astype(np.float64),
+                   roots=offsets[:-1].astype(index_dtype),
+                   max_depth=max(tree.max_depth for tree in trees),
+                   n_features=model.n_features_in_)
+
+    def _predict_block(self, X: np.ndarray) -> np.ndarray:
+        flat = X.ravel()
+        has_missing = bool(np.isnan(flat).any())
+        n_trees, n_rows = len(self.roots), X.shape[0]
+
+        # (tree, row) pairs laid out tree by tree, so a level reads nearby nodes of the same tree
+        leaves = np.repeat(self.roots, n_rows)
+        pairs = np.arange(n_trees * n_rows)
+        row_start = np.tile(np.arange(n_rows, dtype=self.roots.dtype) * X.shape[1], n_trees)
+        nodes = leaves.copy()
+
+        for level in range(self.max_depth):
+            values = flat[row_start + self.feature[nodes]]
+            go_left = values <= self.threshold[nodes]
+            if has_missing:
+                go_left = np.where(np.isnan(values), self.missing_left[nodes], go_left)
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+            # Most paths end well before max_depth: every few levels, stop walking the ones on a leaf
+            if level % 4 == 3:
+                walking = self.left[nodes] != nodes
+                leaves[pairs] = nodes
+                pairs, nodes, row_start = pairs[walking], nodes[walking], row_start[walking]
+                if not len(pairs):
+                    break
+
+        leaves[pairs] = nodes
+        leaf_values = self.value[leaves].reshape(n_trees, n_rows)
+
+        # Same summation order as sklearn (tree by tree), so the results match to the last bit
+        prediction = np.zeros(X.shape[0])
+        for tree_values in leaf_values:
+            prediction += tree_values
+
+        return prediction / len(leaf_values)
+
+    def predict(self, X) -> np.ndarray:
+        """
+        Same result as RandomForestRegressor.predict for a dense or sparse feature matrix
+        """
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[1]} features, the forest expects {self.n_features_in_}")
+
+        block = max(1, PREDICT_BLOCK_NODES // len(self.roots))
+        predictions = []
+        for start in range(0, X.shape[0], block):
+            X_block = X[start:start + block]
+            X_block = X_block.toarray() if sp.issparse(X_block) else np.asarray(X_block)
+
+            # sklearn compares the float32 features with the float64 thresholds
+            predictions.append(self._predict_block(np.ascontiguousarray(X_block, dtype=np.float32)))
+
+        return np.concatenate(predictions) if predictions else np.empty(0)
+
+    def verify(self, model, X, rtol: float = 1e-9, atol: float = 1e-9) -> float:
+        """
+        Compare the predictions with the ones of the sklearn model, raise if they differ
+
+        Returns:
+        float: Largest absolute difference
+        """
+        expected = model.predict(X)
+        predictions = self.predict(X)
+        difference = float(np.max(np.abs(predictions - expected))) if len(expected) else 0.0
+
+        if not np.allclose(predictions, expected, rtol=rtol, atol=atol):
+            raise Exception(f"Compiled forest differs from the sklearn model by up to {difference}")
+
+        return difference
@@ -1,9 +1,41 @@
 import pandas as pd
 from src.utils.engine import init_engine
 from src.utils.load_log import LOAD_LOG
+from src.utils.stream import read_sql_chunks
+from src.utils.categorical import CATEGORICAL_ENCODING, to_categorical
+from src.utils.artifacts import has_artifact, read_artifact
 from datetime import datetime
 
-def extract_warehouse(table_name: str) -> pd.DataFrame:
+def extract_warehouse(table_name: str, chunksize: int = None, categorical: bool = None) -> pd.DataFrame:
+    """
+    Extract a table from the warehouse database without the 'created_at' column.
+    If chunksize is given, an iterator of DataFrame chunks is returned instead.
+    If categorical (default CATEGORICAL_ENCODING), the low cardinality string columns are dictionary-encoded.
+    With ARTIFACTS="reuse", the transformed rows are read from the local snapshot of the warehouse load when there is one.
+    """
+    categorical = CATEGORICAL_ENCODING if categorical is None else categorical
+
+    if has_artifact(f"warehouse/{table_name}"):
+        try:
+            data = read_artifact(f"warehouse/{table_name}", chunked=bool(chunksize))
+        except Exception:
+            print(f"Reading warehouse.{table_name} from the database instead of its snapshot")
+        else:
+            if not categorical:
+                return data
+            return (to_categorical(chunk) for chunk in data) if chunksize else to_categorical(data)
+
+    if chunksize:
+        chunks = read_sql_chunks(f"select * from {table_name}", "warehouse", chunksize,
+                                 log_msg = {"step": "modelling",
+                                            "component": "extraction",
+                                            "table_name": table_name})
+
+        if categorical:
+            return (to_categorical(chunk.iloc[:, :-1].copy()) for chunk in chunks)
+
+        return (chunk.iloc[:, :-1] for chunk in chunks)
+
     try:
         # Initialize database engine
         src_engine = init_engine("warehouse")
@@ -15,6 +47,9 @@ def extract_warehouse(table_name: str) -> pd.DataFrame:
         # Exclude the last column ('created_at')
         df_data = df_data.iloc[:, :-1]  # Or use df_data.drop(columns=["created_at"])
 
+        if categorical:
+            df_data = to_categorical(df_data.copy())
+
         # Log success message
         log_msg = {
             "step": "modelling",
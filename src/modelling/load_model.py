@@ -0,0 +1,242 @@
+from src.utils.load_log import LOAD_LOG
+from dotenv import load_dotenv
+from datetime import datetime
+import hashlib
+import shutil
+import joblib
+import json
+import re
+import os
+
+load_dotenv()
+
+# Where store_model uploads the model: a MinIO bucket, or a local directory standing in for it
+MODEL_BUCKET = os.getenv("MODEL_BUCKET", "car-sales-modelling")
+MODEL_BUCKET_PATH = os.getenv("MODEL_BUCKET_PATH")
+MINIO_HOST = os.getenv("MINIO_HOST", "localhost:9001")
+
+# Content-addressed local copies of the downloaded artifacts
+MODEL_CACHE_PATH = os.getenv("MODEL_CACHE_PATH", ".model_cache")
+
+# Every download is hashed once before it enters the cache, set this to also re-hash a cached artifact on each load
+MODEL_VERIFY_CACHE = os.getenv("MODEL_VERIFY_CACHE", "false").lower() == "true"
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def manifest_name(version: str, model_filename: str = "car_price_model.pkl") -> str:
+    return f"{version}_manifest_{os.path.splitext(model_filename)[0]}.json"
+
+
+def artifact_names(version: str, model_filename: str = "car_price_model.pkl") -> dict:
+    """
+    Object names written by CarPriceModel.store_model for one version
+    """
+    return {
+        "model": f"{version}_{model_filename}",
+        "scaler": f"{version}_scaler_{model_filename}",
+        "columns": f"{version}_columns_{model_filename}",
+    }
+
+
+def compiled_name(version: str, model_filename: str = "car_price_model.pkl") -> str:
+    """
+    Object name of the CompiledForest exported by store_model (missing for older versions)
+    """
+    return f"{version}_compiled_{model_filename}"
+
+
+class LocalBucket:
+    def __init__(self, path: str) -> None:
+        """
+        Directory holding the objects of a bucket, e.g. a copy of the MinIO bucket or a test fixture
+        """
+        self.path = path
+        self.id = f"local/{hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:16]}"
+
+    def list_objects(self) -> list:
+        return sorted(os.listdir(self.path))
+
+    def download(self, object_name: str, file_path: str):
+        shutil.copyfile(os.path.join(self.path, object_name), file_path)
+
+
+class MinioBucket:
+    def __init__(self, bucket_name: str = None, minio_host: str = None,
+                 minio_access_key: str = None, minio_secret_key: str = None) -> None:
+        from minio import Minio
+
+        self.bucket_name = bucket_name or MODEL_BUCKET
+        self.id = f"minio/{self.bucket_name}"
+        self.client = Minio(minio_host or MINIO_HOST,
+                            access_key=minio_access_key or os.getenv("MINIO_ACCESS_KEY"),
+                            secret_key=minio_secret_key or os.getenv("MINIO_SECRET_KEY"),
+                            secure=False)
+
+    def list_objects(self) -> list:
+        return sorted(obj.object_name for obj in self.client.list_objects(self.bucket_name))
+
+    def download(self, object_name: str, file_path: str):
+        self.client.fget_object(self.bucket_name, object_name, file_path)
+
+
+def open_bucket(bucket_path: str = None):
+    """
+    The local stand-in directory if bucket_path (or MODEL_BUCKET_PATH) is set, MinIO otherwise
+    """
+    bucket_path = bucket_path or MODEL_BUCKET_PATH
+
+    return LocalBucket(bucket_path) if bucket_path else MinioBucket()
+
+
+def resolve_version(bucket, version: str = "latest", model_filename: str = "car_price_model.pkl") -> str:
+    """
+    Check that a version exists in the bucket, "latest" resolves to the most recent timestamp
+    """
+    pattern = re.compile(rf"^(\d{{8}}_\d{{6}})_{re.escape(model_filename)}$")
+    versions = sorted(match.group(1) for match in map(pattern.match, bucket.list_objects()) if match)
+
+    if not versions:
+        raise Exception(f"No {model_filename} in bucket {bucket.id}")
+
+    if version == "latest":
+        return versions[-1]
+
+    if version not in versions:
+        raise Exception(f"Version {version} not found in bucket {bucket.id}, available: {', '.join(versions)}")
+
+    return version
+
+
+def fetch_artifact(bucket, object_name: str, expected_sha256: str = None, cache_path: str = None) -> str:
+    """
+    Local path of an object, downloaded only the first time. Objects are stored under
+    their sha256, a ref file maps the bucket object to it. Versioned objects never
+    change, so a ref hit needs no request to the bucket.
+
+    Returns:
+    str: Path of the cached file
+    """
+    cache_path = cache_path or MODEL_CACHE_PATH
+    ref_path = os.path.join(cache_path, "refs", bucket.id, f"{object_name}.json")
+
+    if os.path.exists(ref_path):
+        with open(ref_path, encoding="utf-8") as f:
+            sha256 = json.load(f)["sha256"]
+
+        object_path = os.path.join(cache_path, "objects", sha256[:2], sha256)
+        if os.path.exists(object_path) and (not MODEL_VERIFY_CACHE or file_sha256(object_path) == sha256):
+            return object_path
+
+        print(f"Cached copy of {object_name} is missing or corrupted, downloading it again")
+
+    os.makedirs(os.path.join(cache_path, "tmp"), exist_ok=True)
+    tmp_path = os.path.join(cache_path, "tmp", f"{object_name}.{os.getpid()}")
+
+    print(f"Downloading {object_name} from {bucket.id}")
+    bucket.download(object_name, tmp_path)
+
+    sha256 = file_sha256(tmp_path)
+    if expected_sha256 is not None and sha256 != expected_sha256:
+        os.remove(tmp_path)
+        raise Exception(f"Checksum mismatch for {object_name}: expected {expected_sha256}, got {sha256}")
+
+    object_path = os.path.join(cache_path, "objects", sha256[:2], sha256)
+    os.makedirs(os.path.dirname(object_path), exist_ok=True)
+    os.replace(tmp_path, object_path)
+
+    os.makedirs(os.path.dirname(ref_path), exist_ok=True)
+    with open(f"{ref_path}.tmp", "w", encoding="utf-8") as f:
+        json.dump({"sha256": sha256, "size": os.path.getsize(object_path),
+                   "downloaded_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}, f)
+    os.replace(f"{ref_path}.tmp", ref_path)
+
+    return object_path
+
+
+def load_model(version: str = "latest", bucket_path: str = None, cache_path: str = None,
+               mmap_mode: str = "r", model_filename: str = "car_price_model.pkl", compiled: bool = False):
+    """
+    Load the model, scaler and column information saved by CarPriceModel.store_model
+
+    Parameters:
+    -----------
+    version : str, default="latest"
+        Timestamp prefix of the version (e.g. "20250424_213140") or "latest"
+    bucket_path : str, default=None
+        Local directory standing in for the bucket, MinIO if None (and MODEL_BUCKET_PATH unset)
+    mmap_mode : str, default="r"
+        joblib mmap_mode for the model arrays. Only the node arrays of an exported CompiledForest
+        (compiled=True on a version stored with it) stay memory-mapped from the cache, so processes
+        loading the same version share one copy. The sklearn trees copy their node arrays into the
+        memory of each process when unpickled, and so does a forest compiled on load.
+        None loads everything in memory.
+    compiled : bool, default=False
+        Return a CompiledForest instead of the sklearn model: the exported one when the
+        version has it, compiled from the model otherwise
+
+    Returns:
+    --------
+    tuple
+        (model, scaler, columns, version)
+    """
+    try:
+        bucket = open_bucket(bucket_path)
+        version = resolve_version(bucket, version, model_filename)
+
+        # Checksums written by store_model, older versions have none
+        expected = {}
+        objects = bucket.list_objects()
+        if manifest_name(version, model_filename) in objects:
+            with open(fetch_artifact(bucket, manifest_name(version, model_filename), cache_path=cache_path),
+                      encoding="utf-8") as f:
+                expected = json.load(f)["sha256"]
+
+        paths = {kind: fetch_artifact(bucket, object_name, expected.get(object_name), cache_path)
+                 for kind, object_name in artifact_names(version, model_filename).items()}
+
+        model = joblib.load(paths["model"], mmap_mode=mmap_mode)
+        scaler = joblib.load(paths["scaler"])
+        columns = joblib.load(paths["columns"])
+
+        if compiled and compiled_name(version, model_filename) in objects:
+            object_name = compiled_name(version, model_filename)
+            model = joblib.load(fetch_artifact(bucket, object_name, expected.get(object_name), cache_path),
+                                mmap_mode=mmap_mode)
+        elif compiled:
+            from src.modelling.compiled_forest import CompiledForest
+
+            model = CompiledForest.from_sklearn(model)
+
+        print(f"Loaded car_price model {version} from {bucket.id}")
+
+        log_msg = {
+            "step": "modelling",
+            "component": "Load Model",
+            "status": "success!",
+            "table_name": "car_price",
+            "etl_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+        return model, scaler, columns, version
+
+    except Exception as e:
+        log_msg = {
+            "step": "modelling",
+            "component": "Load Model",
+            "status": "failed",
+            "table_name": "car_price",
+            "etl_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "error_msg": str(e)
+        }
+        raise
+
+    finally:
+        LOAD_LOG(log_msg)
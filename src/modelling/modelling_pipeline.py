@@ -2,17 +2,34 @@ from src.modelling.extract import extract_warehouse
 from src.modelling.Car_Price_Model import CarPriceModel
 
 def Modelling_Pipeline():
+    """
+    Train the car price model on the warehouse car_sales table and store it in MinIO
+
+    Returns:
+    bool: True if the model was trained and stored
+    """
 
     print("------------Start Ectract Data from Warehouse-------------------")
 
     df = extract_warehouse(table_name="car_sales")
 
     print("------------Finish Ectract Data from Warehouse-------------------")
+
+    # extract_warehouse logs its failure and returns None
+    if df is None:
+        print("Extracting car_sales from the warehouse failed")
+        return False
+
     print("=================================================================")
     print("------------Start Modelling Data --------------------------------")
 
     df_model = CarPriceModel(data=df)
 
-    metrics = df_model.run_pipeline(store=True)
+    metrics = df_model.run_pipeline(store=False)
+
+    # The steps of CarPriceModel log their failure and return None / False instead of raising
+    stored = metrics is not None and df_model.store_model()
+
+    print("------------Finish Modelling Data -------------------------------")
 
-    print("------------Finish Modelling Data -------------------------------")
\ No newline at end of file
+    return bool(stored)
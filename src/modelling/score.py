@@ -0,0 +1,264 @@
+from src.utils.load_log import LOAD_LOG
+from dotenv import load_dotenv
+from datetime import datetime
+import pandas as pd
+import argparse
+import time
+import os
+
+load_dotenv()
+
+# Rows per chunk read from the input, scored and written; memory stays bounded by a few chunks per worker
+SCORE_CHUNK_ROWS = int(os.getenv("SCORE_CHUNK_ROWS", "50000"))
+
+# Scoring processes, 1 scores in this process with the sklearn forest. Workers score with the CompiledForest
+# exported by store_model, memory-mapped from the cache, so they share one copy of its node arrays
+# (a version stored without it is compiled in every worker, each holding its own copy)
+SCORE_WORKERS = int(os.getenv("SCORE_WORKERS", "1"))
+
+# Input columns copied next to the prediction in the output (the ones the input has, at least one is required).
+# id_sales_nk is the key of the warehouse car_sales table, id_sales and vin the ones of the staging records
+SCORE_KEEP_COLUMNS = [column.strip() for column in os.getenv("SCORE_KEEP_COLUMNS", "id_sales_nk,id_sales,vin").split(",")
+                      if column.strip()]
+
+# Predictor of a scoring worker process, set by _init_score_worker
+_score_predictor = None
+
+
+def read_jsonl_chunks(path: str, chunk_rows: int = None):
+    """
+    Stream a JSON lines file (one record per line) as DataFrame chunks
+    """
+    with pd.read_json(path, lines=True, chunksize=chunk_rows or SCORE_CHUNK_ROWS) as reader:
+        yield from reader
+
+
+def read_query_chunks(query: str, chunk_rows: int = None, engine_name: str = "warehouse"):
+    """
+    Stream a warehouse query (or table name) with a server-side cursor as DataFrame chunks
+    """
+    from src.utils.stream import read_sql_chunks
+
+    sql = query if " " in query.strip() else f"select * from {query}"
+
+    return read_sql_chunks(sql, engine_name, chunk_rows or SCORE_CHUNK_ROWS,
+                           log_msg = {"step": "scoring",
+                                      "component": "extraction",
+                                      "table_name": query if " " not in query.strip() else "query"})
+
+
+def _load_predictor(version: str, bucket_path: str = None, cache_path: str = None, compiled: bool = False):
+    from src.modelling.load_model import load_model
+    from src.modelling.serve import Predictor
+
+    return Predictor(*load_model(version, bucket_path, cache_path, mmap_mode="r", compiled=compiled))
+
+
+def _init_score_worker(version: str, bucket_path: str, cache_path: str):
+    from multiprocessing.util import Finalize
+    from src.utils.load_log import shutdown_log
+
+    global _score_predictor
+    # The parent already filled the cache, so this only memory-maps the cached compiled forest
+    _score_predictor = _load_predictor(version, bucket_path, cache_path, compiled=True)
+
+    # Worker processes skip atexit, flush their queued log messages on exit instead
+    Finalize(None, shutdown_log, exitpriority=10)
+
+
+def score_chunk(chunk: pd.DataFrame, predictor=None) -> pd.DataFrame:
+    """
+    Predictions of one chunk, with the SCORE_KEEP_COLUMNS of the input
+    """
+    predictor = predictor or _score_predictor
+
+    keep_columns = [column for column in SCORE_KEEP_COLUMNS if column in chunk.columns]
+    if not keep_columns:
+        # Predictions without a key can't be joined back to their records
+        raise Exception(f"None of the SCORE_KEEP_COLUMNS {SCORE_KEEP_COLUMNS} is in the input, "
+                        f"its columns are {list(chunk.columns)}")
+
+    result = chunk[keep_columns].copy()
+    result["predicted_price"] = predictor.predict_frame(chunk)
+    result["model_version"] = predictor.version
+
+    return result.reset_index(drop=True)
+
+
+class ScoreWriter:
+    def __init__(self, output: str = None, table_name: str = None, if_exists: str = "append") -> None:
+        """
+        Write scored chunks one at a time to a Parquet or CSV file (by extension),
+        or to a warehouse table with COPY
+
+        Parameters:
+        -----------
+        output : str, default=None
+            Path of a .parquet or .csv file
+        table_name : str, default=None
+            Warehouse table, used when output is None
+        """
+        if (output is None) == (table_name is None):
+            raise Exception("Give either an output file or a warehouse table")
+
+        self.output = output
+        self.table_name = table_name
+        self.if_exists = if_exists
+        self.rows = 0
+
+    def write_all(self, chunks):
+        """
+        Consume the scored chunks, return the number of rows written
+        """
+        if self.table_name is not None:
+            from src.utils.bulk_load import bulk_load
+
+            # All chunks are copied in one transaction, so a failed run leaves the table as it was
+            return bulk_load(self._count(chunks), self.table_name, "warehouse", if_exists=self.if_exists)["rows"]
+
+        if not self.output.endswith((".parquet", ".csv")):
+            raise Exception(f"Unknown output format of {self.output}, use .parquet or .csv")
+
+        # Written next to the output and renamed once complete, a failed run leaves no partial file
+        tmp_path = f"{self.output}.tmp-{os.getpid()}"
+        try:
+            if self.output.endswith(".parquet"):
+                self._write_parquet(chunks, tmp_path)
+            else:
+                with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+                    for number, chunk in enumerate(self._count(chunks)):
+                        chunk.to_csv(f, index=False, header=number == 0)
+
+            # Same for both formats: an empty input fails instead of leaving an empty file
+            if self.rows == 0:
+                raise Exception("Nothing to score")
+
+            os.replace(tmp_path, self.output)
+
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return self.rows
+
+    def _write_parquet(self, chunks, path: str):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for chunk in self._count(chunks):
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                # A column that is all null in one chunk is typed null, cast it to the file schema
+                writer.write_table(table.cast(writer.schema))
+        finally:
+            if writer is not None:
+                writer.close()
+
+    def _count(self, chunks):
+        for chunk in chunks:
+            self.rows += len(chunk)
+            yield chunk
+
+
+def score(jsonl: str = None, query: str = None, output: str = None, table_name: str = None,
+          version: str = "latest", bucket_path: str = None, cache_path: str = None,
+          workers: int = None, chunk_rows: int = None) -> dict:
+    """
+    Score a JSON lines file or a warehouse query with a stored car price model, streaming
+    it in chunks, and write the predictions to a file or a warehouse table
+
+    Parameters:
+    -----------
+    jsonl : str, default=None
+        Path of the records to score, one JSON object per line
+    query : str, default=None
+        Warehouse table name or select query, used when jsonl is None
+    workers : int, default=None
+        Scoring processes (SCORE_WORKERS if None). Chunks are written in completion order.
+
+    Returns:
+    --------
+    dict
+        Number of rows, elapsed seconds and rows per second
+    """
+    from src.utils.parallel import process_map
+
+    workers = workers or SCORE_WORKERS
+    start_time = time.perf_counter()
+
+    try:
+        # Resolve the version and fill the local cache once (with the compiled forest the workers load),
+        # before any worker starts
+        predictor = _load_predictor(version, bucket_path, cache_path, compiled=workers > 1)
+
+        if jsonl is not None:
+            chunks = read_jsonl_chunks(jsonl, chunk_rows)
+        elif query is not None:
+            chunks = read_query_chunks(query, chunk_rows)
+        else:
+            raise Exception("Give either a JSON lines file or a warehouse query to score")
+
+        if workers > 1:
+            scored = process_map(score_chunk, chunks, workers, initializer=_init_score_worker,
+                                 initargs=(predictor.version, bucket_path, cache_path))
+        else:
+            scored = (score_chunk(chunk, predictor) for chunk in chunks)
+
+        writer = ScoreWriter(output, table_name)
+        rows = writer.write_all(scored)
+
+        elapsed = time.perf_counter() - start_time
+        stats = {
+            "rows": rows,
+            "seconds": round(elapsed, 3),
+            "rows_per_sec": round(rows / elapsed, 1) if elapsed > 0 else float(rows),
+        }
+
+        print(f"Scored {rows} rows with car_price model {predictor.version} in {stats['seconds']}s "
+              f"({stats['rows_per_sec']} rows/sec) to {output or f'warehouse.{table_name}'}")
+
+        log_msg = {
+            "step": "scoring",
+            "component": "Batch Scoring",
+            "status": "success!",
+            "table_name": table_name or os.path.basename(output),
+            "etl_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+        return stats
+
+    except Exception as e:
+        log_msg = {
+            "step": "scoring",
+            "component": "Batch Scoring",
+            "status": "failed",
+            "table_name": table_name or os.path.basename(output or ""),
+            "etl_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "error_msg": str(e)
+        }
+        raise
+
+    finally:
+        LOAD_LOG(log_msg)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch car price scoring")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--jsonl", help="JSON lines file of records to score")
+    source.add_argument("--query", help="Warehouse table name or select query to score")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--output", help="Output .parquet or .csv file")
+    target.add_argument("--table", help="Warehouse table the predictions are copied to")
+    parser.add_argument("--version", default="latest")
+    parser.add_argument("--model-path", default=None, help="Local directory standing in for the model bucket")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-rows", type=int, default=None)
+    args = parser.parse_args()
+
+    score(args.jsonl, args.query, args.output, args.table, args.version, args.model_path,
+          workers=args.workers, chunk_rows=args.chunk_rows)
@@ -0,0 +1,332 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from src.utils.load_log import LOAD_LOG
+from collections import deque
+from dotenv import load_dotenv
+from datetime import datetime
+import pandas as pd
+import numpy as np
+import threading
+import argparse
+import json
+import time
+import os
+
+load_dotenv()
+
+# Local directory standing in for the model bucket, opt-in: the model is loaded from MinIO if empty
+MODEL_PATH = os.getenv("MODEL_PATH") or None
+MODEL_VERSION = os.getenv("MODEL_VERSION", "latest")
+
+# Local only by default
+SERVE_HOST = os.getenv("SERVE_HOST", "127.0.0.1")
+SERVE_PORT = int(os.getenv("SERVE_PORT", "8000"))
+
+# Latency targets reported by /metrics, in milliseconds
+SERVE_P50_TARGET_MS = float(os.getenv("SERVE_P50_TARGET_MS", "5"))
+SERVE_P99_TARGET_MS = float(os.getenv("SERVE_P99_TARGET_MS", "50"))
+
+# Score concurrent POST /predict requests together through a MicroBatcher (BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS)
+SERVE_MICRO_BATCH = os.getenv("SERVE_MICRO_BATCH", "false").lower() == "true"
+
+# Predict with the forest compiled to flat node arrays, faster than sklearn up to a few hundred rows per call
+SERVE_COMPILED_FOREST = os.getenv("SERVE_COMPILED_FOREST", "false").lower() == "true"
+
+# Same features as CarPriceModel
+FEATURES = ['odometer_log', 'condition', 'car_age', 'brand_car_id', 'transmission', 'color', 'mmr']
+REFERENCE_YEAR = 2015
+
+
+def _category_strings(series: pd.Series) -> np.ndarray:
+    """
+    Values of a column as the strings the one-hot columns are named after. An integer
+    column read as float because of missing values is written 5, not 5.0.
+    """
+    if pd.api.types.is_float_dtype(series):
+        values = series.dropna()
+        if (values % 1 == 0).all():
+            series = series.astype("Int64")
+
+    return series.astype(str).to_numpy(dtype=object)
+
+
+class Predictor:
+    def __init__(self, model, scaler, columns, version: str = None) -> None:
+        """
+        Car price predictions without DataFrame setup per request: the one-hot mapping and the scaling of the
+        encoded columns are compiled once into index arrays and constant vectors.
+
+        Parameters:
+        -----------
+        columns : pd.Index or dict
+            Encoded columns of a dense CarPriceModel, or the feature names / vocabulary of a sparse one
+        """
+        self.model = model
+        self.version = version
+
+        # Per-call thread fan-out costs more than it saves on small batches
+        if hasattr(model, "n_jobs"):
+            model.n_jobs = 1
+
+        if isinstance(columns, dict):
+            # Sparse model: only the numeric features are scaled
+            names = list(columns["feature_names"])
+            scaled = set(columns["numeric_features"])
+        else:
+            names = list(columns)
+            scaled = set(names)
+
+        self.numeric = [feature for feature in FEATURES if feature in names]
+        self.numeric_index = np.array([names.index(feature) for feature in self.numeric], dtype=np.int64)
+
+        # Affine map x -> x * scale + shift of every encoded column
+        scale = np.ones(len(names))
+        shift = np.zeros(len(names))
+        scaled_index = [i for i, name in enumerate(names) if name in scaled]
+        scale[scaled_index] = 1 / scaler.scale_
+        shift[scaled_index] = -scaler.mean_ / scaler.scale_
+        self.scale = scale
+        self.shift = shift
+
+        # One-hot columns: {feature: (values, column index of each value)}
+        self.onehot = {}
+        for feature in FEATURES:
+            if feature in self.numeric:
+                continue
+            prefix = f"{feature}_"
+            mapping = {name[len(prefix):]: i for i, name in enumerate(names) if name.startswith(prefix)}
+            self.onehot[feature] = (pd.Index(list(mapping), dtype=object), np.array(list(mapping.values()), dtype=np.int64))
+
+        # Encoded row of a record with every numeric feature 0 and no known category, already scaled
+        self.base = shift.copy()
+
+    def encode(self, records: list) -> np.ndarray:
+        """
+        Scaled feature matrix of a list of records with year, odometer, condition,
+        brand_car_id, transmission, color and mmr
+        """
+        raw = {
+            "odometer_log": np.log1p(np.array([float(record["odometer"]) for record in records])),
+            "car_age": REFERENCE_YEAR - np.array([float(record["year"]) for record in records]),
+        }
+        numbers = [raw[feature] if feature in raw else np.array([float(record[feature]) for record in records])
+                   for feature in self.numeric]
+        categories = [np.array([str(record[feature]) for record in records], dtype=object) for feature in self.onehot]
+
+        return self._encode(len(records), numbers, categories)
+
+    def encode_frame(self, data: pd.DataFrame) -> np.ndarray:
+        """
+        Scaled feature matrix of a DataFrame with the same columns as the records, column by column
+        """
+        raw = {
+            "odometer_log": np.log1p(data["odometer"].to_numpy(dtype=float)),
+            "car_age": REFERENCE_YEAR - data["year"].to_numpy(dtype=float),
+        }
+        numbers = [raw[feature] if feature in raw else data[feature].to_numpy(dtype=float) for feature in self.numeric]
+        categories = [_category_strings(data[feature]) for feature in self.onehot]
+
+        return self._encode(len(data), numbers, categories)
+
+    def _encode(self, rows: int, numbers: list, categories: list) -> np.ndarray:
+        X = np.tile(self.base, (rows, 1))
+
+        X[:, self.numeric_index] = np.column_stack(numbers) * self.scale[self.numeric_index] + self.shift[self.numeric_index]
+
+        for (values, positions), category in zip(self.onehot.values(), categories):
+            found = values.get_indexer(category)
+            rows_found = np.flatnonzero(found >= 0)
+            columns = positions[found[rows_found]]
+            X[rows_found, columns] = self.scale[columns] + self.shift[columns]
+
+        return X
+
+    def predict(self, records: list) -> list:
+        if not records:
+            return []
+
+        return self.model.predict(self.encode(records)).tolist()
+
+    def predict_frame(self, data: pd.DataFrame) -> np.ndarray:
+        if data.empty:
+            return np.empty(0)
+
+        return self.model.predict(self.encode_frame(data))
+
+
+class LatencyTracker:
+    def __init__(self, size: int = 10000) -> None:
+        """
+        Latency of the last size requests per endpoint, in memory only
+        """
+        self.samples = {}
+        self.counts = {}
+        self.errors = {}
+        self.last_errors = {}
+        self.size = size
+        self.lock = threading.Lock()
+
+    def record(self, endpoint: str, seconds: float):
+        with self.lock:
+            self.samples.setdefault(endpoint, deque(maxlen=self.size)).append(seconds * 1000)
+            self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+
+    def record_error(self, endpoint: str, error: Exception):
+        """
+        Count a request that failed with an unexpected (server side) error
+        """
+        with self.lock:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+            self.last_errors[endpoint] = repr(error)
+
+    def summary(self) -> dict:
+        with self.lock:
+            samples = {endpoint: np.array(values) for endpoint, values in self.samples.items()}
+            counts = dict(self.counts)
+            errors = dict(self.errors)
+            last_errors = dict(self.last_errors)
+
+        summary = {}
+        for endpoint, values in samples.items():
+            p50, p99 = np.percentile(values, [50, 99])
+            summary[endpoint] = {
+                "requests": counts[endpoint],
+                "p50_ms": round(float(p50), 3),
+                "p99_ms": round(float(p99), 3),
+                "within_target": bool(p50 <= SERVE_P50_TARGET_MS and p99 <= SERVE_P99_TARGET_MS),
+            }
+
+        for endpoint, count in errors.items():
+            summary.setdefault(endpoint, {"requests": 0})
+            summary[endpoint]["errors"] = count
+            summary[endpoint]["last_error"] = last_errors[endpoint]
+
+        return summary
+
+
+def make_handler(predictor: Predictor, latency: LatencyTracker, batcher=None):
+    class PredictionHandler(BaseHTTPRequestHandler):
+        # Keep-alive connections save the TCP handshake per request
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status: int, body: dict):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200, {"status": "ok", "model_version": predictor.version})
+            elif self.path == "/metrics":
+                metrics = {"latency": latency.summary(),
+                           "target_ms": {"p50": SERVE_P50_TARGET_MS, "p99": SERVE_P99_TARGET_MS}}
+                if batcher is not None:
+                    metrics["micro_batch"] = batcher.stats()
+                self._send(200, metrics)
+            else:
+                self._send(404, {"error": f"Unknown path {self.path}"})
+
+        def do_POST(self):
+            start_time = time.perf_counter()
+
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"null")
+
+                if self.path == "/predict" and batcher is not None:
+                    result = {"prediction": batcher.predict(body)}
+                elif self.path == "/predict":
+                    result = {"prediction": predictor.predict([body])[0]}
+                elif self.path == "/predict/batch":
+                    records = body["records"] if isinstance(body, dict) else body
+                    result = {"predictions": predictor.predict(records)}
+                else:
+                    self._send(404, {"error": f"Unknown path {self.path}"})
+                    return
+
+            except (KeyError, TypeError, ValueError) as e:
+                self._send(400, {"error": f"Invalid record: {e!r}"})
+                return
+
+            except Exception as e:
+                # Anything else is a server side failure, the client still gets a JSON answer
+                latency.record_error(self.path, e)
+                self._send(500, {"error": f"Prediction failed: {e!r}"})
+                return
+
+            self._send(200, result)
+            latency.record(self.path, time.perf_counter() - start_time)
+
+        def log_message(self, format, *args):
+            # No per-request logging
+            pass
+
+    return PredictionHandler
+
+
+def serve(model_path: str = None, version: str = None, host: str = None, port: int = None,
+          micro_batch: bool = None):
+    """
+    Serve predictions over HTTP until interrupted:
+    POST /predict (one record), POST /predict/batch (a list of records), GET /health, GET /metrics
+    """
+    from src.modelling.load_model import load_model
+    from src.modelling.batching import MicroBatcher
+
+    try:
+        model, scaler, columns, version = load_model(version or MODEL_VERSION, bucket_path=model_path or MODEL_PATH,
+                                                     compiled=SERVE_COMPILED_FOREST)
+        predictor = Predictor(model, scaler, columns, version)
+
+        log_msg = {
+            "step": "serving",
+            "component": "Load Model",
+            "status": "success!",
+            "table_name": "car_price",
+            "etl_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+    except Exception as e:
+        log_msg = {
+            "step": "serving",
+            "component": "Load Model",
+            "status": "failed",
+            "table_name": "car_price",
+            "etl_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "error_msg": str(e)
+        }
+        raise
+
+    finally:
+        # The only log message of the service, requests are never written to the database
+        LOAD_LOG(log_msg)
+
+    micro_batch = SERVE_MICRO_BATCH if micro_batch is None else micro_batch
+    batcher = MicroBatcher(predictor.predict) if micro_batch else None
+
+    server = ThreadingHTTPServer((host or SERVE_HOST, port or SERVE_PORT),
+                                 make_handler(predictor, LatencyTracker(), batcher))
+    print(f"Serving car_price model {version} on http://{server.server_address[0]}:{server.server_address[1]}"
+          f"{' with micro-batching' if batcher is not None else ''}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if batcher is not None:
+            batcher.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Car price prediction service")
+    parser.add_argument("--model-path", default=None, help="Local directory standing in for the model bucket")
+    parser.add_argument("--version", default=None)
+    parser.add_argument("--host", default=None)
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--micro-batch", action="store_true", default=None)
+    args = parser.parse_args()
+
+    serve(args.model_path, args.version, args.host, args.port, args.micro_batch)
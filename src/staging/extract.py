@@ -4,6 +4,9 @@ from dotenv import load_dotenv
 from src.utils.helper import auth_gspread
 from src.utils.engine import init_engine
 from src.utils.load_log import LOAD_LOG
+from src.utils.watermark import get_watermark
+from src.utils.stream import read_sql_chunks
+from sqlalchemy import text
 from datetime import datetime
 import requests
 
@@ -57,13 +60,36 @@ def extract_spreadsheet():
     finally:
         LOAD_LOG(log_msg)
         
-def extract_db_source(table_name: str) -> pd.DataFrame:
+def extract_db_source(table_name: str, watermark_column: str = None, chunksize: int = None, inclusive: bool = False) -> pd.DataFrame:
+    """
+    Extract a table from the source database.
+    If watermark_column is given, only rows above the last saved watermark are extracted,
+    with inclusive=True also the rows at the watermark (for an updated-at column, where
+    later rows can share its value).
+    If chunksize is given, an iterator of DataFrame chunks is returned instead.
+    """
+    watermark = get_watermark(table_name, watermark_column) if watermark_column else None
+
+    if watermark is None:
+        query, params = f"select * from {table_name}", None
+    else:
+        operator = ">=" if inclusive else ">"
+        query = text(f"select * from {table_name} where {watermark_column} {operator} :watermark order by {watermark_column}")
+        params = {"watermark": watermark}
+
+    if chunksize:
+        return read_sql_chunks(query, "source", chunksize, params,
+                               log_msg = {"step" : "staging",
+                                          "component":"extraction",
+                                          "table_name": table_name})
+
     try:
 
         src_engine = init_engine("source")
 
-        df_data = pd.read_sql(sql = f"select * from {table_name}",
-                              con = src_engine)
+        df_data = pd.read_sql(sql = query,
+                              con = src_engine,
+                              params = params)
 
         log_msg = {
             "step" : "staging",
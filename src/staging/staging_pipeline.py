@@ -1,14 +1,129 @@
 # Import relevant Module
-def Staging_Pipeline():
+import os
+
+def _track_watermark(chunks, column: str, state: dict):
+    """
+    Pass DataFrame chunks through while recording their row count and the max of column
+    """
+    for chunk in chunks:
+        if len(chunk) > 0:
+            chunk_max = chunk[column].max()
+            state["max"] = chunk_max if state["max"] is None else max(state["max"], chunk_max)
+            state["rows"] += len(chunk)
+
+        yield chunk
+
+
+def _required(result, task_name: str):
+    """
+    Extract and load functions log their errors and return None / False, turn that into a task failure
+    """
+    if result is None or result is False:
+        raise Exception(f"{task_name} failed, see etl_log")
+
+    return result
+
+
+def Staging_Pipeline(incremental: bool = None, chunksize: int = None, parallel: bool = None, fail_fast: bool = None, tables: list = None):
     from src.staging.extract import extract_db_source, extract_spreadsheet, extract_api
     from src.staging.load import load_to_staging
+    from src.utils.watermark import set_watermark
+    from src.utils.parallel import run_tasks
+    from src.utils.artifacts import ArtifactWriter, artifacts_enabled, write_artifact, remove_artifact
+
+    # Incremental extraction pulls only rows above the saved watermark of car_sales
+    if incremental is None:
+        incremental = os.getenv("INCREMENTAL_EXTRACT", "false").lower() == "true"
+    watermark_column = os.getenv("WATERMARK_COLUMN", "id_sales")
+    # An updated-at column also picks up changed rows, its ties are re-read and merged again on id_sales
+    inclusive = watermark_column != "id_sales"
+
+    # Streaming extraction moves car_sales in chunks of this many rows
+    if chunksize is None and os.getenv("EXTRACT_CHUNKSIZE"):
+        chunksize = int(os.getenv("EXTRACT_CHUNKSIZE"))
+
+    # Parallel mode runs the three extracts, then the three loads, concurrently
+    if parallel is None:
+        parallel = os.getenv("STAGING_PARALLEL", "false").lower() == "true"
+    if fail_fast is None:
+        fail_fast = os.getenv("STAGING_FAIL_FAST", "false").lower() == "true"
+    max_workers = None if parallel else 1
+
+    # Only stage the given tables (car_sales, car_brand, us_state), all of them by default
+    tables = tables or ["car_sales", "car_brand", "us_state"]
+
+    def extract_car_sales():
+        return _required(extract_db_source("car_sales", watermark_column if incremental else None, chunksize=chunksize, inclusive=inclusive), "extract car_sales")
+
+    # Get data from various sources, a streamed car_sales is only read while it's loaded so it has no extract task
+    extract_tasks = {
+        "extract car_sales": extract_car_sales,
+        "extract car_brand": lambda: _required(extract_spreadsheet(), "extract car_brand"),
+        "extract us_state": lambda: _required(extract_api(), "extract us_state"),
+    }
+    extract_tasks = {name: task for name, task in extract_tasks.items() if name.split(" ", 1)[1] in tables}
+    if chunksize:
+        extract_tasks.pop("extract car_sales", None)
+
+    extracted = run_tasks(extract_tasks, max_workers=max_workers, fail_fast=fail_fast)
+
+    # Load data to staging database, the watermark only moves after a successful load
+    def load_car_sales():
+        df_db = extract_car_sales() if chunksize else extracted["extract car_sales"]["result"]
+
+        watermark = {"rows": 0, "max": None}
+        df_db = _track_watermark([df_db] if not chunksize else df_db, watermark_column, watermark)
+
+        # A full load replaces the table, so its rows are also a snapshot of staging.car_sales
+        writer = ArtifactWriter("staging/car_sales") if artifacts_enabled() and not incremental else None
+        if writer is not None:
+            df_db = writer.tap(df_db)
+
+        if incremental:
+            # The merge changes staging.car_sales in place, an older full snapshot of it is stale from now on
+            remove_artifact("staging/car_sales")
+            loaded = load_to_staging(data=df_db, table_name="car_sales", method="merge", key_column="id_sales")
+        else:
+            loaded = load_to_staging(data=df_db, table_name="car_sales", method="copy")
+
+        if writer is not None and loaded:
+            writer.commit()
+        elif writer is not None:
+            writer.abort()
+        _required(loaded, "load car_sales")
+
+        if watermark["rows"] > 0:
+            set_watermark("car_sales", watermark_column, watermark["max"])
+        elif incremental:
+            print("No new rows in source car_sales since the last watermark")
+
+        return True
+
+    def load_lookup(table_name):
+        data = extracted[f"extract {table_name}"]["result"]
+        _required(load_to_staging(data=data, table_name=table_name), f"load {table_name}")
+
+        if artifacts_enabled():
+            write_artifact(f"staging/{table_name}", data)
+
+        return True
+
+    load_tasks = {
+        "load car_sales": load_car_sales,
+        "load car_brand": lambda: load_lookup("car_brand"),
+        "load us_state": lambda: load_lookup("us_state"),
+    }
+
+    # Only load the tables whose extraction succeeded
+    load_tasks = {name: task for name, task in load_tasks.items()
+                  if extracted.get(name.replace("load", "extract", 1), {}).get("status") == "success"}
+
+    # The streamed car_sales is extracted and loaded in one task, its time and errors are those of both
+    if chunksize and "car_sales" in tables:
+        load_tasks = {"extract and load car_sales": load_car_sales, **load_tasks}
 
-    # Get data from various sources
-    df_db = extract_db_source("car_sales")
-    df_spreadsheet = extract_spreadsheet()
-    df_api = extract_api()
+    loaded = run_tasks(load_tasks, max_workers=max_workers, fail_fast=fail_fast)
 
-    # Load data to staging database
-    load_to_staging(data=df_db, table_name="car_sales")
-    load_to_staging(data=df_spreadsheet, table_name="car_brand")
-    load_to_staging(data=df_api, table_name="us_state")
\ No newline at end of file
+    # Per-task status and timings, without the extracted data
+    return {name: {key: value for key, value in task.items() if key != "result"}
+            for name, task in {**extracted, **loaded}.items()}
@@ -0,0 +1,228 @@
+from src.utils.load_log import LOAD_LOG
+from dotenv import load_dotenv
+from datetime import datetime
+import pandas as pd
+import shutil
+import json
+import os
+
+load_dotenv()
+
+# "off": no artifacts, "write": every stage also snapshots its output to ARTIFACT_PATH,
+# "reuse": like "write", and a stage reads its input from the snapshot when there is one
+ARTIFACTS = os.getenv("ARTIFACTS", "off").lower()
+ARTIFACT_PATH = os.getenv("ARTIFACT_PATH", "artifacts")
+
+# "arrow" (Arrow IPC files, memory-mapped when read) or "parquet" (compressed)
+ARTIFACT_FORMAT = os.getenv("ARTIFACT_FORMAT", "arrow").lower()
+
+# Maximum number of rows per partition file
+ARTIFACT_PARTITION_ROWS = int(os.getenv("ARTIFACT_PARTITION_ROWS", "500000"))
+
+MANIFEST = "manifest.json"
+
+
+def artifacts_enabled() -> bool:
+    return ARTIFACTS in ("write", "reuse")
+
+
+def artifact_dir(name: str) -> str:
+    return os.path.join(ARTIFACT_PATH, name)
+
+
+def has_artifact(name: str) -> bool:
+    """
+    True if a complete snapshot exists and ARTIFACTS="reuse"
+    """
+    return ARTIFACTS == "reuse" and os.path.exists(os.path.join(artifact_dir(name), MANIFEST))
+
+
+class ArtifactWriter:
+    def __init__(self, name: str, file_format: str = None) -> None:
+        """
+        Write a DataFrame, or DataFrame chunks, as partition files of one snapshot.
+        The files go to a temporary directory, commit() replaces the previous snapshot with it.
+
+        Parameters:
+        -----------
+        name : str
+            Snapshot name, e.g. "staging/car_sales"
+        file_format : str, default=None
+            "arrow" or "parquet", ARTIFACT_FORMAT if None
+        """
+        import pyarrow  # noqa: F401  (fail early when the optional dependency is missing)
+
+        self.name = name
+        self.file_format = file_format or ARTIFACT_FORMAT
+        self.path = artifact_dir(name)
+        self.tmp_path = f"{self.path}.tmp-{os.getpid()}"
+        self.parts = 0
+        self.rows = 0
+
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+        os.makedirs(self.tmp_path)
+
+    def write(self, data: pd.DataFrame):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        for start in range(0, max(len(data), 1), ARTIFACT_PARTITION_ROWS):
+            table = pa.Table.from_pandas(data.iloc[start:start + ARTIFACT_PARTITION_ROWS], preserve_index=False)
+            part_path = os.path.join(self.tmp_path, f"part-{self.parts:05d}.{self.file_format}")
+
+            if self.file_format == "parquet":
+                pq.write_table(table, part_path)
+            else:
+                with pa.OSFile(part_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+
+            self.parts += 1
+            self.rows += table.num_rows
+
+    def tap(self, chunks):
+        """
+        Pass DataFrame chunks through while writing them
+        """
+        for chunk in chunks:
+            self.write(chunk)
+            yield chunk
+
+    def commit(self):
+        try:
+            manifest = {
+                "name": self.name,
+                "format": self.file_format,
+                "parts": self.parts,
+                "rows": self.rows,
+                "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            with open(os.path.join(self.tmp_path, MANIFEST), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=4)
+
+            shutil.rmtree(self.path, ignore_errors=True)
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            os.replace(self.tmp_path, self.path)
+
+            print(f"Artifact {self.name}: {self.rows} rows in {self.parts} {self.file_format} files")
+
+            log_msg = {
+                "step": "artifact",
+                "component": "write",
+                "status": "success!",
+                "table_name": self.name,
+                "etl_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            }
+
+        except Exception as e:
+            log_msg = {
+                "step": "artifact",
+                "component": "write",
+                "status": "failed",
+                "table_name": self.name,
+                "etl_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "error_msg": str(e)
+            }
+
+        finally:
+            LOAD_LOG(log_msg)
+
+    def abort(self):
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+
+
+def remove_artifact(name: str) -> None:
+    """
+    Delete a snapshot, e.g. once the table it copies was changed in place
+    """
+    path = artifact_dir(name)
+    if os.path.exists(path):
+        shutil.rmtree(path, ignore_errors=True)
+        print(f"Artifact {name} removed")
+
+
+def write_artifact(name: str, data: pd.DataFrame, file_format: str = None) -> None:
+    """
+    Snapshot one DataFrame
+    """
+    writer = ArtifactWriter(name, file_format)
+    writer.write(data)
+    writer.commit()
+
+
+def _read_part(path: str, file_format: str):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if file_format == "parquet":
+        return pq.read_table(path, memory_map=True)
+
+    # The record batches point into the mapped file, nothing is copied until to_pandas()
+    return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+
+def _check_part(path: str, file_format: str):
+    """
+    Open the footer of a partition file without reading its rows
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if file_format == "parquet":
+        pq.ParquetFile(path)
+    else:
+        pa.ipc.open_file(pa.memory_map(path, "r"))
+
+
+def read_artifact(name: str, chunked: bool = False):
+    """
+    Read a snapshot written by ArtifactWriter.
+    If chunked, an iterator of one DataFrame per partition file is returned instead.
+    A snapshot that can't be read is logged, removed and the error re-raised, so the
+    caller can read the database instead.
+    """
+    path = artifact_dir(name)
+
+    try:
+        with open(os.path.join(path, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        parts = [os.path.join(path, f"part-{part:05d}.{manifest['format']}") for part in range(manifest["parts"])]
+
+        print(f"Reading artifact {name} ({manifest['rows']} rows, created at {manifest['created_at']})")
+
+        if chunked:
+            # Fail now rather than halfway through the stream
+            for part in parts:
+                _check_part(part, manifest["format"])
+            data = (_read_part(part, manifest["format"]).to_pandas() for part in parts)
+        else:
+            import pyarrow as pa
+
+            tables = [_read_part(part, manifest["format"]) for part in parts]
+            data = pa.concat_tables(tables, promote_options="default").to_pandas()
+
+        log_msg = {
+            "step": "artifact",
+            "component": "read",
+            "status": "success!",
+            "table_name": name,
+            "etl_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+        return data
+
+    except Exception as e:
+        log_msg = {
+            "step": "artifact",
+            "component": "read",
+            "status": "failed",
+            "table_name": name,
+            "etl_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "error_msg": str(e)
+        }
+        print(f"Artifact {name} can't be read ({e}), removing it")
+        remove_artifact(name)
+        raise
+
+    finally:
+        LOAD_LOG(log_msg)
@@ -0,0 +1,255 @@
+from src.utils.engine import init_engine
+from dotenv import load_dotenv
+import pandas as pd
+import time
+import io
+import os
+
+load_dotenv()
+
+# Number of rows streamed to postgres per COPY statement
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "100000"))
+
+# Marker written for missing values, so empty strings stay empty strings
+NULL_MARKER = r"\N"
+
+
+def _integral_floats_to_int(chunk: pd.DataFrame) -> pd.DataFrame:
+    """
+    Float columns holding only whole numbers (e.g. int columns with NaN) are written
+    as integers, because COPY rejects "2015.0" for an int4 column.
+    """
+    float_columns = [col for col in chunk.columns if pd.api.types.is_float_dtype(chunk[col])]
+
+    converted = {}
+    for col in float_columns:
+        values = chunk[col].dropna()
+        if len(values) and (values % 1 == 0).all():
+            converted[col] = chunk[col].astype("Int64")
+
+    if converted:
+        chunk = chunk.assign(**converted)
+
+    return chunk
+
+
+def _load_stats(rows: int, start_time: float) -> dict:
+    elapsed = time.perf_counter() - start_time
+
+    return {
+        "rows": rows,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed > 0 else float(rows),
+    }
+
+
+def copy_dataframe(data: pd.DataFrame, table_name: str, dbapi_conn, chunk_size: int = None) -> int:
+    """
+    Stream a DataFrame into an existing table with COPY FROM STDIN (CSV),
+    one bounded chunk at a time. The caller owns the transaction.
+
+    Returns:
+    int: Number of rows copied
+    """
+    chunk_size = chunk_size or BULK_CHUNK_SIZE
+
+    columns = ", ".join(f'"{col}"' for col in data.columns)
+    copy_sql = f"COPY {table_name} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '{NULL_MARKER}')"
+
+    total_rows = 0
+    with dbapi_conn.cursor() as cursor:
+        for start in range(0, len(data), chunk_size):
+            chunk = _integral_floats_to_int(data.iloc[start:start + chunk_size])
+
+            buffer = io.StringIO()
+            chunk.to_csv(buffer, index=False, header=False, na_rep=NULL_MARKER)
+            buffer.seek(0)
+
+            cursor.copy_expert(copy_sql, buffer)
+            total_rows += len(chunk)
+
+    return total_rows
+
+
+def bulk_load(data, table_name: str, engine_name: str,
+              if_exists: str = "append", chunk_size: int = None) -> dict:
+    """
+    Load a DataFrame, or an iterator of DataFrame chunks, to a table with COPY
+    instead of row-wise inserts. The table is created (or replaced) from the schema
+    of the first chunk the same way to_sql does, and all chunks are loaded in one transaction.
+
+    Returns:
+    dict: Number of rows, elapsed seconds and throughput of the load
+    """
+    engine = init_engine(engine_name)
+
+    if isinstance(data, pd.DataFrame):
+        data = [data]
+
+    start_time = time.perf_counter()
+
+    rows = 0
+    raw_conn = None
+    try:
+        for chunk in data:
+            if raw_conn is None:
+                # Create / replace an empty table with the dataframe schema
+                chunk.head(0).to_sql(name = table_name,
+                                     con = engine,
+                                     if_exists = if_exists,
+                                     index = False)
+
+                raw_conn = engine.raw_connection()
+
+            rows += copy_dataframe(chunk, f'"{table_name}"', raw_conn, chunk_size)
+
+        if raw_conn is not None:
+            raw_conn.commit()
+    except Exception:
+        if raw_conn is not None:
+            raw_conn.rollback()
+        raise
+    finally:
+        if raw_conn is not None:
+            raw_conn.close()
+
+    stats = _load_stats(rows, start_time)
+
+    print(f"Bulk loaded {rows} rows to {engine_name}.{table_name} in {stats['seconds']}s ({stats['rows_per_sec']} rows/sec)")
+
+    return stats
+
+
+def _temp_table_load(data, table_name: str, engine_name: str, apply_statements, chunk_size: int = None) -> int:
+    """
+    COPY a DataFrame, or an iterator of DataFrame chunks, into a temp table shaped like
+    table_name, then run apply_statements(temp_table, columns) in the same transaction.
+
+    Returns:
+    int: Number of rows copied to the temp table
+    """
+    engine = init_engine(engine_name)
+
+    if isinstance(data, pd.DataFrame):
+        data = [data]
+
+    temp_table = f"tmp_{table_name}"
+
+    rows = 0
+    columns = None
+    raw_conn = None
+    try:
+        for chunk in data:
+            if raw_conn is None:
+                # Create the target table from the dataframe schema if it doesn't exist yet
+                chunk.head(0).to_sql(name = table_name,
+                                     con = engine,
+                                     if_exists = "append",
+                                     index = False)
+
+                columns = list(chunk.columns)
+
+                raw_conn = engine.raw_connection()
+                with raw_conn.cursor() as cursor:
+                    cursor.execute(f'CREATE TEMP TABLE "{temp_table}" (LIKE "{table_name}" INCLUDING DEFAULTS) ON COMMIT DROP')
+
+            rows += copy_dataframe(chunk, f'"{temp_table}"', raw_conn, chunk_size)
+
+        if raw_conn is not None:
+            with raw_conn.cursor() as cursor:
+                for statement in apply_statements(temp_table, columns):
+                    cursor.execute(statement)
+
+            raw_conn.commit()
+    except Exception:
+        if raw_conn is not None:
+            raw_conn.rollback()
+        raise
+    finally:
+        if raw_conn is not None:
+            raw_conn.close()
+
+    return rows
+
+
+def merge_load(data, table_name: str, engine_name: str,
+               key_column: str, chunk_size: int = None) -> dict:
+    """
+    Merge a DataFrame, or an iterator of DataFrame chunks, into a table: rows whose
+    key_column already exists are replaced, new rows are appended. The batch is
+    copied to a temp table first, so the cost depends on the batch size, not the table size.
+
+    Returns:
+    dict: Number of rows, elapsed seconds and throughput of the load
+    """
+    def delete_insert(temp_table, columns):
+        column_list = ", ".join(f'"{col}"' for col in columns)
+
+        return [
+            f'DELETE FROM "{table_name}" t USING "{temp_table}" s WHERE t."{key_column}" = s."{key_column}"',
+            f'INSERT INTO "{table_name}" ({column_list}) SELECT {column_list} FROM "{temp_table}"',
+        ]
+
+    start_time = time.perf_counter()
+
+    rows = _temp_table_load(data, table_name, engine_name, delete_insert, chunk_size)
+
+    stats = _load_stats(rows, start_time)
+
+    print(f"Merged {rows} rows to {engine_name}.{table_name} in {stats['seconds']}s ({stats['rows_per_sec']} rows/sec)")
+
+    return stats
+
+
+def upsert_statement(table_name: str, columns: list, conflict_column: str, source: str) -> str:
+    """
+    INSERT ... ON CONFLICT DO UPDATE statement copying columns from source (a table
+    name or a parenthesized query) into table_name. Rows whose values didn't change are not rewritten.
+    With no column besides conflict_column there is nothing to update, existing keys are skipped
+    with ON CONFLICT DO NOTHING.
+    """
+    column_list = ", ".join(f'"{col}"' for col in columns)
+    update_columns = [col for col in columns if col != conflict_column]
+
+    # DISTINCT ON keeps one row per key, a key can't be updated twice in one statement
+    insert = (
+        f'INSERT INTO "{table_name}" AS t ({column_list}) '
+        f'SELECT DISTINCT ON ("{conflict_column}") {column_list} FROM {source} s ORDER BY "{conflict_column}" '
+    )
+
+    if not update_columns:
+        return insert + f'ON CONFLICT ("{conflict_column}") DO NOTHING'
+
+    update_set = ", ".join(f'"{col}" = EXCLUDED."{col}"' for col in update_columns)
+    target_values = ", ".join(f't."{col}"' for col in update_columns)
+    new_values = ", ".join(f'EXCLUDED."{col}"' for col in update_columns)
+
+    return (
+        insert +
+        f'ON CONFLICT ("{conflict_column}") DO UPDATE SET {update_set} '
+        f'WHERE ({target_values}) IS DISTINCT FROM ({new_values})'
+    )
+
+
+def upsert_load(data, table_name: str, engine_name: str,
+                conflict_column: str, chunk_size: int = None) -> dict:
+    """
+    Upsert a DataFrame, or an iterator of DataFrame chunks, into a table with a unique
+    conflict_column: the batch is copied to a temp table, then applied with one
+    INSERT ... ON CONFLICT DO UPDATE. Rows whose values didn't change are not rewritten.
+
+    Returns:
+    dict: Number of rows, elapsed seconds and throughput of the load
+    """
+    def insert_on_conflict(temp_table, columns):
+        return [upsert_statement(table_name, columns, conflict_column, f'"{temp_table}"')]
+
+    start_time = time.perf_counter()
+
+    rows = _temp_table_load(data, table_name, engine_name, insert_on_conflict, chunk_size)
+
+    stats = _load_stats(rows, start_time)
+
+    print(f"Upserted {rows} rows to {engine_name}.{table_name} in {stats['seconds']}s ({stats['rows_per_sec']} rows/sec)")
+
+    return stats
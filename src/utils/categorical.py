@@ -0,0 +1,58 @@
+from dotenv import load_dotenv
+import pandas as pd
+import numpy as np
+import os
+
+load_dotenv()
+
+# Dictionary-encode the low cardinality string columns when they are extracted
+CATEGORICAL_ENCODING = os.getenv("CATEGORICAL_ENCODING", "false").lower() == "true"
+
+# Low cardinality string columns of car_sales
+CATEGORICAL_COLUMNS = ["brand_car", "transmission", "state", "color", "interior", "body"]
+
+
+def is_categorical(series: pd.Series) -> bool:
+    return isinstance(series.dtype, pd.CategoricalDtype)
+
+
+def to_categorical(data: pd.DataFrame, columns: list = None) -> pd.DataFrame:
+    """
+    Convert the string columns of data (in place) to the pandas category dtype:
+    one small dictionary of distinct values plus an integer code per row
+    """
+    columns = CATEGORICAL_COLUMNS if columns is None else columns
+
+    for column in columns:
+        if column in data.columns and not is_categorical(data[column]):
+            data[column] = data[column].astype("category")
+
+    return data
+
+
+def lower_categorical(series: pd.Series) -> pd.Series:
+    """
+    Lower case a categorical Series over its dictionary only. Categories that become
+    equal (e.g. "Ford" and "FORD") are merged into one.
+    """
+    if len(series.cat.categories) == 0:
+        return series
+
+    lowered = series.cat.categories.str.lower()
+    new_codes, categories = pd.factorize(lowered)
+
+    codes = series.cat.codes.to_numpy()
+    codes = np.where(codes >= 0, new_codes[np.maximum(codes, 0)], -1)
+
+    return pd.Series(pd.Categorical.from_codes(codes, categories=categories),
+                     index=series.index, name=series.name)
+
+
+def compact_categorical(series: pd.Series) -> pd.Series:
+    """
+    Drop the unused categories and sort the rest, so encodings built from the
+    categories (e.g. get_dummies) match the ones built from plain strings
+    """
+    series = series.cat.remove_unused_categories()
+
+    return series.cat.reorder_categories(sorted(series.cat.categories))
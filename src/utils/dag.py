@@ -0,0 +1,172 @@
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from src.utils.engine import init_engine
+from sqlalchemy import text
+from dotenv import load_dotenv
+from datetime import datetime
+import threading
+import json
+import time
+import os
+
+load_dotenv()
+
+# Local file keeping the fingerprint of the last successful run of each task
+DAG_STATE_PATH = os.getenv("DAG_STATE_PATH", ".pipeline_state.json")
+
+
+def table_fingerprint(engine_name: str, table_name: str, watermark_column: str = None) -> dict:
+    """
+    Cheap fingerprint of a table computed in the database: the row count plus either
+    the max of watermark_column or a checksum of every row.
+    """
+    if watermark_column:
+        query = f"select count(*), max({watermark_column})::text from {table_name}"
+    else:
+        query = f"select count(*), coalesce(sum(hashtextextended(t::text, 0)::numeric), 0)::text from {table_name} t"
+
+    with init_engine(engine_name).connect() as conn:
+        row_count, value = conn.execute(text(query)).fetchone()
+
+    return {"table": f"{engine_name}.{table_name}", "rows": row_count, "value": value}
+
+
+class Task:
+    def __init__(self, name: str, func, deps: list = None, fingerprint=None) -> None:
+        """
+        Parameters:
+        -----------
+        name : str
+            Unique task name
+        func : callable
+            Function without arguments, the task fails when it raises
+        deps : list, default=None
+            Names of the tasks that must succeed (or be skipped) first
+        fingerprint : callable, default=None
+            Function returning a JSON-serializable fingerprint of the task inputs.
+            Without it the task always runs.
+        """
+        self.name = name
+        self.func = func
+        self.deps = deps or []
+        self.fingerprint = fingerprint
+
+
+class DAG:
+    def __init__(self, tasks: list, state_path: str = None, max_workers: int = None) -> None:
+        self.tasks = {task.name: task for task in tasks}
+        self.state_path = state_path or DAG_STATE_PATH
+        self.max_workers = max_workers or len(self.tasks)
+        self._lock = threading.Lock()
+
+        for task in tasks:
+            for dep in task.deps:
+                if dep not in self.tasks:
+                    raise Exception(f"Unknown dependency '{dep}' of task '{task.name}'")
+
+        self._check_acyclic()
+
+    def _check_acyclic(self):
+        visiting, visited = set(), set()
+
+        def visit(name):
+            if name in visited:
+                return
+            if name in visiting:
+                raise Exception(f"Dependency cycle at task '{name}'")
+
+            visiting.add(name)
+            for dep in self.tasks[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self.tasks:
+            visit(name)
+
+    def load_state(self) -> dict:
+        if not os.path.exists(self.state_path):
+            return {}
+
+        with open(self.state_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_task_state(self, name: str, fingerprint) -> None:
+        with self._lock:
+            state = self.load_state()
+            state[name] = {
+                "fingerprint": fingerprint,
+                "finished_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            }
+
+            tmp_path = f"{self.state_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f, indent=4, default=str)
+            os.replace(tmp_path, self.state_path)
+
+    def _run_task(self, task: Task, state: dict, force: bool) -> dict:
+        start_time = time.perf_counter()
+
+        fingerprint = None
+        if task.fingerprint is not None:
+            try:
+                # Round-trip through JSON so it compares equal to the persisted one
+                fingerprint = json.loads(json.dumps(task.fingerprint(), default=str))
+            except Exception as e:
+                print(f"Task {task.name}: fingerprint failed, running anyway ({e})")
+
+        previous = state.get(task.name)
+        if not force and fingerprint is not None and previous and previous["fingerprint"] == fingerprint:
+            return {"status": "skipped", "seconds": round(time.perf_counter() - start_time, 3), "error": None}
+
+        try:
+            task.func()
+        except Exception as e:
+            return {"status": "failed", "seconds": round(time.perf_counter() - start_time, 3), "error": str(e)}
+
+        self._save_task_state(task.name, fingerprint)
+
+        return {"status": "success", "seconds": round(time.perf_counter() - start_time, 3), "error": None}
+
+    def run(self, force: bool = False) -> dict:
+        """
+        Run every task once its dependencies are done, independent tasks concurrently.
+        A task is skipped when its fingerprint equals the one of its last successful run,
+        and is not run when a dependency failed.
+
+        Returns:
+        --------
+        dict
+            Per task: status ("success" / "skipped" / "failed" / "upstream failed"), seconds and error
+        """
+        state = self.load_state()
+        report = {}
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while len(report) < len(self.tasks):
+                for name, task in self.tasks.items():
+                    if name in report or name in running.values():
+                        continue
+                    if not all(dep in report for dep in task.deps):
+                        continue
+
+                    if any(report[dep]["status"] in ("failed", "upstream failed") for dep in task.deps):
+                        report[name] = {"status": "upstream failed", "seconds": 0.0, "error": None}
+                        print(f"Task {name}: upstream failed")
+                        continue
+
+                    print(f"Task {name}: started")
+                    running[executor.submit(self._run_task, task, state, force)] = name
+
+                if not running:
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    report[name] = future.result()
+
+                    print(f"Task {name}: {report[name]['status']} in {report[name]['seconds']}s"
+                          + (f" ({report[name]['error']})" if report[name]["error"] else ""))
+
+        return report
@@ -1,5 +1,7 @@
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+import threading
+import atexit
 import os
 
 load_dotenv()
@@ -26,31 +28,79 @@ LOG_POSTGRES_PORT = os.getenv("LOG_POSTGRES_PORT")
 
 HOST = os.getenv("HOST")
 
+# Connection pool settings, shared by every engine in the registry
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+DB_URLS = {
+    "source": f"postgresql://{SRC_POSTGRES_USER}:{SRC_POSTGRES_PASSWORD}@{HOST}:{SRC_POSTGRES_PORT}/{SRC_POSTGRES_DB}",
+    "staging": f"postgresql://{STG_POSTGRES_USER}:{STG_POSTGRES_PASSWORD}@{HOST}:{STG_POSTGRES_PORT}/{STG_POSTGRES_DB}",
+    "warehouse": f"postgresql://{DWH_POSTGRES_USER}:{DWH_POSTGRES_PASSWORD}@{HOST}:{DWH_POSTGRES_PORT}/{DWH_POSTGRES_DB}",
+    "log": f"postgresql://{LOG_POSTGRES_USER}:{LOG_POSTGRES_PASSWORD}@{HOST}:{LOG_POSTGRES_PORT}/{LOG_POSTGRES_DB}",
+}
+
+# Registry of engines keyed by role, created once per process
+_engines = {}
+_connections_opened = {}
+_lock = threading.Lock()
+
+
+def _count_connection(engine_name: str):
+    def on_connect(dbapi_connection, connection_record):
+        with _lock:
+            _connections_opened[engine_name] = _connections_opened.get(engine_name, 0) + 1
+
+    return on_connect
+
 
 def init_engine(engine_name: str):
+    """
+    Return the shared engine for the given role (source, staging, warehouse or log).
+    The engine is created on first use and reused by every module afterwards.
+    """
     try:
-        if engine_name.lower() == "source":
-            conn_src = create_engine(f"postgresql://{SRC_POSTGRES_USER}:{SRC_POSTGRES_PASSWORD}@{HOST}:{SRC_POSTGRES_PORT}/{SRC_POSTGRES_DB}")
-
-            return conn_src
-
-        elif engine_name.lower() == "staging":
-            conn_stg = create_engine(f"postgresql://{STG_POSTGRES_USER}:{STG_POSTGRES_PASSWORD}@{HOST}:{STG_POSTGRES_PORT}/{STG_POSTGRES_DB}")
-            
-            return conn_stg
-        
-        elif engine_name.lower() == "warehouse":
-            conn_dwh = create_engine(f"postgresql://{DWH_POSTGRES_USER}:{DWH_POSTGRES_PASSWORD}@{HOST}:{DWH_POSTGRES_PORT}/{DWH_POSTGRES_DB}")
-            
-            return conn_dwh
-        
-        elif engine_name.lower() == "log":
-            conn_log = create_engine(f"postgresql://{LOG_POSTGRES_USER}:{LOG_POSTGRES_PASSWORD}@{HOST}:{LOG_POSTGRES_PORT}/{LOG_POSTGRES_DB}")
-            
-            return conn_log
-        
-        else:
+        engine_name = engine_name.lower()
+
+        if engine_name not in DB_URLS:
             raise Exception("Unknown engine name!")
-        
+
+        with _lock:
+            if engine_name not in _engines:
+                engine = create_engine(DB_URLS[engine_name],
+                                       pool_size = DB_POOL_SIZE,
+                                       max_overflow = DB_MAX_OVERFLOW,
+                                       pool_recycle = DB_POOL_RECYCLE,
+                                       pool_pre_ping = DB_POOL_PRE_PING)
+
+                event.listen(engine, "connect", _count_connection(engine_name))
+                _connections_opened.setdefault(engine_name, 0)
+                _engines[engine_name] = engine
+
+            return _engines[engine_name]
+
     except Exception as e:
-        raise Exception(e)
\ No newline at end of file
+        raise Exception(e)
+
+
+def connection_stats() -> dict:
+    """
+    Number of physical connections opened so far, per engine role
+    """
+    with _lock:
+        return dict(_connections_opened)
+
+
+def dispose_engines():
+    """
+    Close every pooled connection and empty the registry
+    """
+    with _lock:
+        for engine in _engines.values():
+            engine.dispose()
+
+        _engines.clear()
+
+
+atexit.register(dispose_engines)
@@ -1,21 +1,142 @@
 from src.utils.engine import init_engine
+from dotenv import load_dotenv
 import pandas as pd
-def LOAD_LOG(log_msg: dict):
+import threading
+import atexit
+import queue
+import json
+import time
+import os
+
+load_dotenv()
+
+# Flush to etl_log once this many events are queued or this many seconds have passed
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "50"))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "2"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Events that can't reach the log database are appended here as JSON lines
+LOG_FALLBACK_PATH = os.getenv("LOG_FALLBACK_PATH", "etl_log_fallback.jsonl")
+
+_STOP = object()
+_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def _write_fallback(rows: list):
+    try:
+        with open(LOG_FALLBACK_PATH, "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, default=str) + "\n")
+
+    except Exception as e:
+        print("Can't save your log message to fallback file. Cause: ", str(e))
+
+
+def _write_batch(rows: list):
     """
-    This function is used to save the log message to the database.
+    Insert a batch of log messages to etl_log in one multi-row statement
     """
     try:
-        # create connection to database
         log_engine = init_engine("log")
 
-        # convert dictionary to dataframe
-        df_log = pd.DataFrame([log_msg])
+        df_log = pd.DataFrame(rows)
 
-        #extract data log
         df_log.to_sql(name = "etl_log",  # Your log table
                         con = log_engine,
                         if_exists = "append",
-                        index = False)
+                        index = False,
+                        method = "multi")
+
+    except Exception as e:
+        print("Can't save your log message. Cause: ", str(e))
+        _write_fallback(rows)
+
+
+def _run():
+    stopping = False
+
+    while not stopping:
+        batch = []
+
+        # Wait for the first event, then collect more until the batch is full or the interval ends
+        item = _queue.get()
+        deadline = time.monotonic() + LOG_FLUSH_INTERVAL
+
+        while True:
+            if item is _STOP:
+                stopping = True
+            else:
+                batch.append(item)
+
+            if stopping or len(batch) >= LOG_BATCH_SIZE:
+                break
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            try:
+                item = _queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+
+        if stopping:
+            # Drain whatever is still queued behind the stop marker
+            while True:
+                try:
+                    item = _queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _STOP:
+                    batch.append(item)
+
+        if batch:
+            _write_batch(batch)
+
+
+def _start_worker():
+    global _worker
+
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name="etl-log-writer", daemon=True)
+            _worker.start()
+
+
+def LOAD_LOG(log_msg: dict):
+    """
+    This function is used to save the log message to the database.
+    The message is queued and written in batches by a background thread.
+    """
+    try:
+        _start_worker()
+        _queue.put_nowait(dict(log_msg))
+
+    except queue.Full:
+        # Never block the pipeline on logging
+        _write_fallback([log_msg])
+
     except Exception as e:
         print("Can't save your log message. Cause: ", str(e))
 
+
+def shutdown_log(timeout: float = 30):
+    """
+    Flush every queued log message and stop the background writer
+    """
+    global _worker
+
+    with _worker_lock:
+        worker = _worker
+        _worker = None
+
+    if worker is None or not worker.is_alive():
+        return
+
+    _queue.put(_STOP)
+    worker.join(timeout)
+
+
+atexit.register(shutdown_log)
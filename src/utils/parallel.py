@@ -0,0 +1,111 @@
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+import multiprocessing
+import time
+
+
+def _timed(func):
+    start_time = time.perf_counter()
+    try:
+        return func(), None, time.perf_counter() - start_time
+    except Exception as e:
+        return None, e, time.perf_counter() - start_time
+
+
+def run_tasks(tasks: dict, max_workers: int = None, fail_fast: bool = True) -> dict:
+    """
+    Run independent I/O-bound tasks concurrently in a thread pool.
+
+    Parameters:
+    -----------
+    tasks : dict
+        Mapping of task name to a callable without arguments. A task fails when it raises.
+    max_workers : int, default=None
+        Number of threads, one per task if None
+    fail_fast : bool, default=True
+        If True, cancel the tasks that haven't started at the first failure and raise
+        once the running ones finish. If False, run every task and report the failures.
+
+    Returns:
+    --------
+    dict
+        Per task: status ("success" / "failed" / "cancelled"), result, seconds and error
+    """
+    report = {}
+
+    if not tasks:
+        return report
+
+    executor = ThreadPoolExecutor(max_workers=max_workers or len(tasks))
+    try:
+        futures = {name: executor.submit(_timed, func) for name, func in tasks.items()}
+        pending = set(futures.values())
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+            if fail_fast and any(future.result()[1] is not None for future in done):
+                for future in pending:
+                    future.cancel()
+                break
+
+    finally:
+        executor.shutdown(wait=True)
+
+    for name, future in futures.items():
+        if future.cancelled():
+            report[name] = {"status": "cancelled", "result": None, "seconds": 0.0, "error": None}
+            print(f"Task {name}: cancelled")
+            continue
+
+        result, error, seconds = future.result()
+        report[name] = {
+            "status": "failed" if error else "success",
+            "result": result,
+            "seconds": round(seconds, 3),
+            "error": str(error) if error else None,
+        }
+
+        print(f"Task {name}: {report[name]['status']} in {report[name]['seconds']}s" + (f" ({error})" if error else ""))
+
+    failed_tasks = [name for name, task in report.items() if task["status"] == "failed"]
+    if failed_tasks and fail_fast:
+        raise Exception(f"Task failed: {', '.join(failed_tasks)}")
+
+    return report
+
+
+def process_map(func, items, max_workers: int, initializer=None, initargs: tuple = (), max_pending: int = None):
+    """
+    Run func on every item in a pool of worker processes and yield the results as they
+    complete (not in item order), for CPU-bound work. Processes are spawned, so they
+    share no database connection with the parent, and func / initializer must be module level.
+
+    Parameters:
+    -----------
+    max_pending : int, default=None
+        Submit at most this many items ahead of the consumer (2 * max_workers if None),
+        so results that are not consumed yet don't pile up in memory
+    """
+    max_pending = max_pending or 2 * max_workers
+    items = iter(items)
+
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=initializer, initargs=initargs) as executor:
+        pending = set()
+        try:
+            while True:
+                for item in items:
+                    pending.add(executor.submit(func, item))
+                    if len(pending) >= max_pending:
+                        break
+
+                if not pending:
+                    return
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        finally:
+            # Consumer stopped or a task failed: don't start the remaining items
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,42 @@
+from src.utils.engine import init_engine
+from src.utils.load_log import LOAD_LOG
+from datetime import datetime
+import pandas as pd
+
+
+def read_sql_chunks(sql, engine_name: str, chunksize: int, params: dict = None, log_msg: dict = None):
+    """
+    Read a query with a server-side cursor and yield it as DataFrame chunks of
+    at most chunksize rows, so only one chunk is held in memory at a time.
+
+    If log_msg is given, it is completed with the status and saved once the
+    stream is exhausted or fails. Errors are re-raised so a consumer never
+    mistakes a broken stream for a complete one.
+    """
+    engine = init_engine(engine_name)
+
+    try:
+        with engine.connect().execution_options(stream_results=True) as conn:
+            for chunk in pd.read_sql(sql = sql,
+                                     con = conn,
+                                     params = params,
+                                     chunksize = chunksize):
+                yield chunk
+
+        if log_msg is not None:
+            log_msg = {**log_msg,
+                       "status": "success!",
+                       "etl_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+
+    except Exception as e:
+        if log_msg is not None:
+            log_msg = {**log_msg,
+                       "status": "failed",
+                       "etl_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                       "error_msg": str(e)}
+        raise
+
+    finally:
+        # A stream closed early by its consumer has no status to report
+        if log_msg is not None and "status" in log_msg:
+            LOAD_LOG(log_msg)
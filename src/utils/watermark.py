@@ -0,0 +1,52 @@
+from src.utils.engine import init_engine
+from sqlalchemy import text
+
+# State table keeping the high-water mark of each incrementally extracted table
+WATERMARK_TABLE = "etl_watermark"
+
+
+def _ensure_watermark_table(conn):
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} (
+            table_name varchar NOT NULL PRIMARY KEY,
+            column_name varchar NOT NULL,
+            watermark varchar NULL,
+            updated_at timestamp DEFAULT now() NOT NULL
+        )
+    """))
+
+
+def get_watermark(table_name: str, column_name: str, engine_name: str = "staging"):
+    """
+    Get the last extracted value of column_name for a table.
+
+    Returns:
+    str: The watermark, or None if the table was never extracted incrementally
+         (or was tracked on another column)
+    """
+    with init_engine(engine_name).begin() as conn:
+        _ensure_watermark_table(conn)
+
+        row = conn.execute(text(f"""
+            SELECT watermark FROM {WATERMARK_TABLE}
+            WHERE table_name = :table_name AND column_name = :column_name
+        """), {"table_name": table_name, "column_name": column_name}).fetchone()
+
+    return row[0] if row else None
+
+
+def set_watermark(table_name: str, column_name: str, watermark, engine_name: str = "staging") -> None:
+    """
+    Save the new high-water mark of a table
+    """
+    with init_engine(engine_name).begin() as conn:
+        _ensure_watermark_table(conn)
+
+        conn.execute(text(f"""
+            INSERT INTO {WATERMARK_TABLE} (table_name, column_name, watermark, updated_at)
+            VALUES (:table_name, :column_name, :watermark, now())
+            ON CONFLICT (table_name) DO UPDATE
+            SET column_name = EXCLUDED.column_name,
+                watermark = EXCLUDED.watermark,
+                updated_at = EXCLUDED.updated_at
+        """), {"table_name": table_name, "column_name": column_name, "watermark": str(watermark)})
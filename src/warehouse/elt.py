@@ -0,0 +1,148 @@
+from src.utils.load_log import LOAD_LOG
+from src.utils.engine import init_engine
+from src.utils.bulk_load import upsert_statement
+from sqlalchemy import text
+from dotenv import load_dotenv
+from datetime import datetime
+import time
+import os
+
+load_dotenv()
+
+# Schema of the warehouse database where the staging tables are visible. It belongs to this module:
+# the foreign tables in it are replaced on every run, don't create anything else there
+ELT_STAGING_SCHEMA = os.getenv("ELT_STAGING_SCHEMA", "elt_staging_fdw")
+
+# Import the staging tables into ELT_STAGING_SCHEMA with postgres_fdw before each run,
+# disable it when staging and warehouse share one database
+ELT_LINK_STAGING = os.getenv("ELT_LINK_STAGING", "true").lower() == "true"
+
+# Address of the staging database as seen from the warehouse server
+ELT_STAGING_HOST = os.getenv("ELT_STAGING_HOST", "staging_db")
+ELT_STAGING_PORT = os.getenv("ELT_STAGING_PORT", "5432")
+
+
+def _fdw_options(values: dict, update: bool = False):
+    """
+    OPTIONS list of a server or user mapping, the values are quoted as SQL literals
+    """
+    from psycopg2 import sql
+
+    action = "SET " if update else ""
+    return sql.SQL(", ").join(sql.SQL(f"{action}{name} {{}}").format(sql.Literal(value))
+                              for name, value in values.items())
+
+
+def link_staging(tables: list, engine_name: str = "warehouse") -> None:
+    """
+    Expose the staging tables in the warehouse database as foreign tables (postgres_fdw).
+    Only the foreign tables of the given tables are dropped and re-imported, so they follow
+    the columns of the staging tables. The server and user mapping are created once and
+    their options brought up to date on every run.
+    """
+    from psycopg2 import sql
+
+    schema = sql.Identifier(ELT_STAGING_SCHEMA)
+    server = {"host": ELT_STAGING_HOST, "port": str(ELT_STAGING_PORT), "dbname": os.getenv("STG_POSTGRES_DB")}
+    mapping = {"user": os.getenv("STG_POSTGRES_USER"), "password": os.getenv("STG_POSTGRES_PASSWORD")}
+
+    # Plain DBAPI cursor: the statements (holding the password) never reach SQLAlchemy error messages
+    raw_conn = init_engine(engine_name).raw_connection()
+    try:
+        with raw_conn.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS postgres_fdw")
+
+            cursor.execute(sql.SQL("CREATE SERVER IF NOT EXISTS staging_server FOREIGN DATA WRAPPER postgres_fdw "
+                                   "OPTIONS ({})").format(_fdw_options(server)))
+            cursor.execute(sql.SQL("ALTER SERVER staging_server OPTIONS ({})").format(_fdw_options(server, update=True)))
+
+            cursor.execute(sql.SQL("CREATE USER MAPPING IF NOT EXISTS FOR CURRENT_USER SERVER staging_server "
+                                   "OPTIONS ({})").format(_fdw_options(mapping)))
+            cursor.execute(sql.SQL("ALTER USER MAPPING FOR CURRENT_USER SERVER staging_server "
+                                   "OPTIONS ({})").format(_fdw_options(mapping, update=True)))
+
+            cursor.execute(sql.SQL("CREATE SCHEMA IF NOT EXISTS {}").format(schema))
+            for table in tables:
+                # Fails (instead of dropping it) if a regular table of that name was created there
+                cursor.execute(sql.SQL("DROP FOREIGN TABLE IF EXISTS {}.{}").format(schema, sql.Identifier(table)))
+            cursor.execute(sql.SQL("IMPORT FOREIGN SCHEMA public LIMIT TO ({}) FROM SERVER staging_server INTO {}")
+                           .format(sql.SQL(", ").join(map(sql.Identifier, tables)), schema))
+
+        raw_conn.commit()
+    except Exception:
+        raw_conn.rollback()
+        raise
+    finally:
+        raw_conn.close()
+
+
+def elt_transform_load(plan, table_name: str, target_table: str, key_column: str,
+                       engine_name: str = "warehouse") -> dict:
+    """
+    Run a TransformationPlan on a staging table inside the warehouse database and
+    upsert the result into target_table with one INSERT ... SELECT, no row goes through pandas.
+
+    Parameters:
+    -----------
+    plan : TransformationPlan
+        Transformation of the staging table, its join_data step is done with car_brand and us_state
+    table_name : str
+        Staging table to transform
+    target_table : str
+        Warehouse table to upsert into
+    key_column : str
+        Unique column of target_table
+
+    Returns:
+    --------
+    dict
+        Number of rows written and elapsed seconds
+    """
+    try:
+        start_time = time.perf_counter()
+
+        if ELT_LINK_STAGING:
+            link_staging([table_name, "car_brand", "us_state"], engine_name)
+
+        schema = ELT_STAGING_SCHEMA
+        engine = init_engine(engine_name)
+
+        with engine.begin() as conn:
+            table_columns = list(conn.execute(text(f'SELECT * FROM "{schema}"."{table_name}" LIMIT 0')).keys())
+
+            # Same cleaning of the lookup tables as the pandas pipeline
+            brand_table = f'(SELECT lower("brand_name") AS "brand_name", "brand_car_id" FROM "{schema}"."car_brand")'
+            state_table = f'(SELECT "code", "id_state" FROM "{schema}"."us_state")'
+
+            query, params = plan.compile_elt(f'"{schema}"."{table_name}"', table_columns, brand_table, state_table)
+
+            target_columns = [col for col in conn.execute(text(f"SELECT * FROM ({query}) q LIMIT 0"), params).keys()]
+            statement = upsert_statement(target_table, target_columns, key_column, f"({query})")
+
+            rows = conn.execute(text(statement), params).rowcount
+
+        elapsed = time.perf_counter() - start_time
+        print(f"ELT upserted {rows} rows from staging.{table_name} to {engine_name}.{target_table} in {elapsed:.3f}s")
+
+        log_msg = {
+            "step" : "warehouse",
+            "component":"elt",
+            "status": "success!",
+            "table_name": target_table,
+            "etl_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),  # Current timestamp
+        }
+
+        return {"rows": rows, "seconds": round(elapsed, 3)}
+
+    except Exception as e:
+        log_msg = {
+            "step" : "warehouse",
+            "component":"elt",
+            "status": "failed!",
+            "table_name": target_table,
+            "etl_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),  # Current timestamp
+            "error_msg": str(e)
+        }
+
+    finally:
+        LOAD_LOG(log_msg)
@@ -1,17 +1,55 @@
 import pandas as pd
 from src.utils.engine import init_engine
 from src.utils.load_log import LOAD_LOG
+from src.utils.stream import read_sql_chunks
+from src.utils.categorical import CATEGORICAL_ENCODING, to_categorical
+from src.utils.artifacts import has_artifact, read_artifact
+from sqlalchemy import text
 from datetime import datetime
 
 
 
-def extract_db_staging(table_name: str) -> pd.DataFrame:
+def extract_db_staging(table_name: str, chunksize: int = None, query: str = None, params: dict = None,
+                       categorical: bool = None) -> pd.DataFrame:
+    """
+    Extract a table from the staging database.
+    If chunksize is given, an iterator of DataFrame chunks is returned instead.
+    If query is given (e.g. a compiled TransformationPlan), it is run instead of select *.
+    If categorical (default CATEGORICAL_ENCODING), the low cardinality string columns are dictionary-encoded.
+    With ARTIFACTS="reuse", a full table is read from its local snapshot when there is one.
+    """
+    categorical = CATEGORICAL_ENCODING if categorical is None else categorical
+
+    if query is None and has_artifact(f"staging/{table_name}"):
+        try:
+            data = read_artifact(f"staging/{table_name}", chunked=bool(chunksize))
+        except Exception:
+            print(f"Reading staging.{table_name} from the database instead of its snapshot")
+        else:
+            if not categorical:
+                return data
+            return (to_categorical(chunk) for chunk in data) if chunksize else to_categorical(data)
+
+    query = text(query) if query is not None else f"select * from {table_name}"
+
+    if chunksize:
+        chunks = read_sql_chunks(query, "staging", chunksize, params,
+                                 log_msg = {"step" : "warehouse",
+                                            "component":"extraction",
+                                            "table_name": table_name})
+
+        return (to_categorical(chunk) for chunk in chunks) if categorical else chunks
+
     try:
 
         src_engine = init_engine("staging")
 
-        df_data = pd.read_sql(sql = f"select * from {table_name}",
-                              con = src_engine)
+        df_data = pd.read_sql(sql = query,
+                              con = src_engine,
+                              params = params)
+
+        if categorical:
+            df_data = to_categorical(df_data)
 
         log_msg = {
             "step" : "warehouse",
@@ -1,19 +1,41 @@
 import pandas as pd
 from src.utils.load_log import LOAD_LOG
 from src.utils.engine import init_engine
+from src.utils.bulk_load import bulk_load, upsert_load
 from datetime import datetime
+import time
 
 
-def load_to_warehouse(data: pd.DataFrame, table_name: str) -> None:
+def load_to_warehouse(data: pd.DataFrame, table_name: str, method: str = "insert", key_column: str = None) -> bool:
+    """
+    Load data to the warehouse database.
+    method="insert" uses to_sql row inserts, method="copy" streams the data with COPY,
+    method="upsert" inserts new rows and updates existing ones on the unique key_column.
+    For "copy" and "upsert", data may also be an iterator of DataFrame chunks.
+
+    Returns:
+    bool: True if the data is loaded, False if failed
+    """
     try:
-        stg_engine = init_engine("warehouse")
+        if method == "upsert":
+            upsert_load(data, table_name, "warehouse", key_column)
+
+        elif method == "copy":
+            bulk_load(data, table_name, "warehouse", if_exists = "append")
+
+        else:
+            stg_engine = init_engine("warehouse")
+
+            start_time = time.perf_counter()
 
-        data = data.copy()
+            data.to_sql(name = table_name,
+                            con = stg_engine,
+                            if_exists = "append",
+                            index = False)
 
-        data.to_sql(name = table_name,
-                        con = stg_engine,
-                        if_exists = "append",
-                        index = False)
+            elapsed = time.perf_counter() - start_time
+            rows_per_sec = len(data) / elapsed if elapsed > 0 else len(data)
+            print(f"Inserted {len(data)} rows to warehouse.{table_name} in {elapsed:.3f}s ({rows_per_sec:.1f} rows/sec)")
         
         log_msg = {
             "step" : "warehouse",
@@ -22,7 +44,8 @@ def load_to_warehouse(data: pd.DataFrame, table_name: str) -> None:
             "table_name": table_name,
             "etl_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),  # Current timestamp
         }
-        
+
+        return True
     
     except Exception as e:
         log_msg = {
@@ -34,6 +57,7 @@ def load_to_warehouse(data: pd.DataFrame, table_name: str) -> None:
             "error_msg": str(e)
         }
 
+        return False
+
     finally:
-        LOAD_LOG(log_msg)
-        stg_engine.dispose()
\ No newline at end of file
+        LOAD_LOG(log_msg)
\ No newline at end of file
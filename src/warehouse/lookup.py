@@ -0,0 +1,163 @@
+from src.utils.load_log import LOAD_LOG
+from src.utils.dag import table_fingerprint
+from datetime import datetime
+import pandas as pd
+import numpy as np
+import json
+import os
+
+
+class DimensionLookup:
+    def __init__(self, table_name: str, key_column: str, id_column: str,
+                 lower_keys: bool = True, cache_path: str = None) -> None:
+        """
+        Compact key -> surrogate id index of a dimension table, replacing a left merge
+        on the key column by a vectorized lookup. Only the key and id columns are kept.
+
+        Parameters:
+        -----------
+        table_name : str
+            Staging table of the dimension (e.g. car_brand)
+        key_column : str
+            Natural key matched against the fact column (e.g. brand_name)
+        id_column : str
+            Surrogate id returned by the lookup (e.g. brand_car_id)
+        lower_keys : bool, default=True
+            Lower case the keys, like the to_lower_case step of the pipeline
+        cache_path : str, default=None
+            JSON file keeping the index between runs, {FILE_PATH}/{table_name}_lookup.json if None
+        """
+        self.table_name = table_name
+        self.key_column = key_column
+        self.id_column = id_column
+        self.lower_keys = lower_keys
+        self.cache_path = cache_path or os.path.join(os.getenv("FILE_PATH", "."), f"{table_name}_lookup.json")
+
+        self.keys = pd.Index([], dtype=object)
+        self.ids = np.array([], dtype=np.float64)
+        self.fingerprint = None
+        self.unmatched_rows = 0
+        self.unmatched_keys = set()
+
+    def build(self, data: pd.DataFrame, fingerprint=None):
+        """
+        Build the index from the dimension rows. A key appearing twice keeps its first id
+        (a merge would duplicate the fact rows instead).
+        """
+        keys = data[self.key_column]
+        if self.lower_keys:
+            keys = keys.str.lower()
+
+        first = ~keys.duplicated() & keys.notna()
+        duplicates = int(keys.duplicated().sum())
+        if duplicates:
+            print(f"Lookup {self.table_name}: {duplicates} duplicate {self.key_column} keys, the first id is used")
+
+        self.keys = pd.Index(keys[first].to_numpy(dtype=object))
+        self.ids = pd.to_numeric(data.loc[first, self.id_column], errors='coerce').to_numpy(dtype=np.float64)
+        self.fingerprint = fingerprint
+
+        return self
+
+    def load(self, engine_name: str = "staging", force: bool = False):
+        """
+        Load the index from the cache file if the dimension table didn't change since it was
+        built (same row count and checksum in the database), otherwise rebuild and cache it.
+        """
+        from src.warehouse.extract import extract_db_staging
+
+        try:
+            fingerprint = json.loads(json.dumps(table_fingerprint(engine_name, self.table_name), default=str))
+
+            cached = None
+            if not force and os.path.exists(self.cache_path):
+                with open(self.cache_path, encoding='utf-8') as f:
+                    cached = json.load(f)
+
+            if cached is not None and cached["fingerprint"] == fingerprint:
+                self.keys = pd.Index(cached["keys"], dtype=object)
+                self.ids = np.array(cached["ids"], dtype=np.float64)
+                self.fingerprint = fingerprint
+                source = "cache"
+            else:
+                data = extract_db_staging(self.table_name,
+                                          query=f'select "{self.key_column}", "{self.id_column}" from {self.table_name}')
+                self.build(data, fingerprint)
+                self.save()
+                source = "database"
+
+            print(f"Lookup {self.table_name}: {len(self.keys)} keys loaded from {source}")
+
+            log_msg = {
+                "step": "Warehouse",
+                "component": "Dimension Lookup",
+                "status": "success!",
+                "table_name": self.table_name,
+                "etl_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            }
+
+            return self
+
+        except Exception as e:
+            log_msg = {
+                "step": "Warehouse",
+                "component": "Dimension Lookup",
+                "status": "Failed!",
+                "table_name": self.table_name,
+                "etl_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "error_msg": str(e)
+            }
+            raise
+
+        finally:
+            LOAD_LOG(log_msg)
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+
+        state = {
+            "fingerprint": self.fingerprint,
+            "key_column": self.key_column,
+            "id_column": self.id_column,
+            "keys": self.keys.tolist(),
+            "ids": [None if np.isnan(value) else value for value in self.ids.tolist()],
+        }
+
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, self.cache_path)
+
+    def lookup(self, values: pd.Series) -> pd.Series:
+        """
+        Map fact keys to surrogate ids (NaN when unmatched) and count the non-null keys
+        without a match
+        """
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Probe only the categories, then expand through the row codes
+            category_codes = np.append(self.keys.get_indexer(values.cat.categories), -1)
+            codes = category_codes[values.cat.codes.to_numpy()]
+        else:
+            # Hash table probe of the key index, -1 when the key is unknown
+            codes = self.keys.get_indexer(values)
+        ids = np.where(codes >= 0, self.ids[np.maximum(codes, 0)] if len(self.ids) else np.nan, np.nan)
+
+        missed = values[(codes < 0) & values.notna().to_numpy()]
+        if len(missed):
+            self.unmatched_rows += int(len(missed))
+            self.unmatched_keys.update(missed.unique().tolist())
+
+        return pd.Series(ids, index=values.index, name=self.id_column)
+
+    def report(self) -> dict:
+        """
+        Unmatched keys seen by lookup() so far: number of rows, distinct keys and a sample
+        """
+        sample = sorted(str(value) for value in self.unmatched_keys)[:10]
+        report = {"table_name": self.table_name, "rows": self.unmatched_rows,
+                  "distinct": len(self.unmatched_keys), "sample": sample}
+
+        print(f"Lookup {self.table_name}: {report['rows']} rows with an unmatched {self.key_column}"
+              + (f" ({report['distinct']} distinct, e.g. {', '.join(sample)})" if sample else ""))
+
+        return report
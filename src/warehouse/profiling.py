@@ -3,6 +3,7 @@ import json
 from dotenv import load_dotenv
 import os
 from datetime import datetime
+from src.warehouse.sketches import ColumnSketch
 load_dotenv()
 
 class Profiling:
@@ -17,15 +18,65 @@ class Profiling:
     def get_columns(self):
         return self.list_columns
     
-    def selected_columns(self, data_type, duplicate_value, unique_value, missing_value, negative_value):
+    def selected_columns(self, data_type, duplicate_value, unique_value, missing_value, negative_value, top_k=0):
         self.data_type = data_type
         self.duplicate_value = duplicate_value
         self.unique_value = unique_value
         self.missing_value = missing_value
         self.negative_value = negative_value
+        self.top_k = top_k
         self.column_profiling = list(set(self.duplicate_value + self.data_type + self.unique_value + self.missing_value + self.negative_value))
             
 
+    def compute_metrics(self):
+        """
+        Compute every selected metric for all its columns at once, with one vectorized
+        operation per metric instead of one scan per column and check
+
+        Returns:
+        dict: Metrics per column
+        """
+        data = self.data
+        metrics = {col: {} for col in self.list_columns}
+
+        if self.data_type:
+            for col, dtype in data[self.data_type].dtypes.items():
+                metrics[col]["data_type"] = str(dtype)
+
+        if self.missing_value:
+            for col, total in data[self.missing_value].isnull().sum().items():
+                metrics[col]["missing_value"] = int(total)
+
+        if self.duplicate_value:
+            # A value is a duplicate for every repeat after its first occurrence (NaN included)
+            distinct = data[self.duplicate_value].nunique(dropna=False)
+            for col, total in distinct.items():
+                metrics[col]["duplicate_value"] = int(len(data) - total)
+                metrics[col]["distinct_value"] = int(total)
+
+        if self.negative_value:
+            numeric = data[self.negative_value]
+            to_convert = {col: pd.to_numeric(numeric[col], errors='coerce')
+                          for col in numeric.columns if not pd.api.types.is_numeric_dtype(numeric[col])}
+            if to_convert:
+                numeric = numeric.assign(**to_convert)
+
+            negative, minimum, maximum = (numeric < 0).sum(), numeric.min(), numeric.max()
+            for col in numeric.columns:
+                metrics[col]["negative_value"] = int(negative[col])
+                metrics[col]["min_value"] = None if pd.isna(minimum[col]) else float(minimum[col])
+                metrics[col]["max_value"] = None if pd.isna(maximum[col]) else float(maximum[col])
+
+        for col in self.unique_value:
+            metrics[col]["unique_value"] = self.check_unique_value(col)
+
+            if self.top_k:
+                top_values = data[col].value_counts(dropna=False).head(self.top_k)
+                metrics[col]["top_values"] = {str(value): int(total) for value, total in top_values.items()}
+
+        return metrics
+
+
 
     def check_data_type(self, col_name: str):
         """
@@ -101,27 +152,237 @@ class Profiling:
             "report": {}
         }
 
+        metrics = self.compute_metrics()
+
         for col in self.list_columns:
-            self.dict_report["report"][col] = {}
+            self.dict_report["report"][col] = metrics[col]
+
+        print(self.dict_report)
+        save_result = self.save_report()
+
+        return self.dict_report
+    
+
+
+class SketchProfiling(Profiling):
+    def __init__(self, table_name, columns=None, error_rate=0.01, epsilon=0.001, delta=0.01, top_k=10, sample_size=20) -> None:
+        """
+        Approximate profiling over a stream of DataFrame chunks, in bounded memory.
+        Distinct counts use HyperLogLog (error_rate is the relative standard error),
+        frequent values use Count-Min (overestimated by at most epsilon * rows with
+        probability 1 - delta) and example values come from a reservoir sample.
+        """
+        self.table_name = table_name
+        self.list_columns = list(columns) if columns is not None else None
+        self.sketch_params = {"error_rate": error_rate, "epsilon": epsilon, "delta": delta,
+                              "top_k": top_k, "sample_size": sample_size}
+        self.sketches = {}
+
+    def selected_columns(self, data_type, duplicate_value, unique_value, missing_value, negative_value, top_k=0):
+        super().selected_columns(data_type, duplicate_value, unique_value, missing_value, negative_value, top_k)
+        if top_k:
+            self.sketch_params["top_k"] = top_k
+
+        categorical = set(self.duplicate_value + self.unique_value)
+        for col in self.column_profiling:
+            self.sketches[col] = ColumnSketch(categorical = col in categorical,
+                                              numeric = col in self.negative_value,
+                                              **self.sketch_params)
+
+    def update(self, chunk):
+        """
+        Add one DataFrame chunk to the column sketches
+        """
+        if self.list_columns is None:
+            self.list_columns = list(chunk.columns)
+
+        for col, sketch in self.sketches.items():
+            if col in chunk.columns:
+                sketch.update(chunk[col])
+
+    def profile_stream(self, chunks):
+        """
+        Pass DataFrame chunks through, updating the sketches on the way
+        """
+        for chunk in chunks:
+            self.update(chunk)
+            yield chunk
+
+    def compute_metrics(self):
+        """
+        Read the metrics of every profiled column from its sketch (approximate for
+        distinct, duplicate and top values, exact for the rest)
+        """
+        metrics = {col: {} for col in self.list_columns}
 
+        for col, sketch in self.sketches.items():
             if col in self.data_type:
-                self.dict_report["report"][col]["data_type"] = self.check_data_type(col)
+                metrics[col]["data_type"] = sketch.data_type
+
+            if col in self.missing_value:
+                metrics[col]["missing_value"] = sketch.missing
 
             if col in self.duplicate_value:
-                self.dict_report["report"][col]["duplicate_value"] = self.check_duplicate_value(col)
+                metrics[col]["duplicate_value"] = sketch.count - sketch.distinct()
+                metrics[col]["distinct_value"] = sketch.distinct()
 
             if col in self.unique_value:
-                self.dict_report["report"][col]["unique_value"] = self.check_unique_value(col)
-
-            if col in self.missing_value:
-                self.dict_report["report"][col]["missing_value"] = self.check_missing_value(col)
+                metrics[col]["distinct_value"] = sketch.distinct()
+                metrics[col]["top_values"] = sketch.frequent.top()
+                metrics[col]["sample_value"] = sketch.reservoir.sample
 
             if col in self.negative_value:
-                self.dict_report["report"][col]["negative_value"] = self.check_negative_value(col)
+                metrics[col]["negative_value"] = sketch.negative
+                metrics[col]["min_value"] = sketch.minimum
+                metrics[col]["max_value"] = sketch.maximum
+
+        return metrics
+
+    def reporting(self):
+        """
+        Generate approximate profiling report
+        """
+        self.dict_report = {
+            "created_at": datetime.now().strftime("%Y-%m-%d"),
+            "approximate": True,
+            "error_bounds": self.sketch_params,
+            "report": self.compute_metrics()
+        }
 
         print(self.dict_report)
         save_result = self.save_report()
 
         return self.dict_report
-    
 
+
+
+class IncrementalProfiling(SketchProfiling):
+    def __init__(self, table_name, key_column="id_sales", columns=None, state_path=None, **sketch_params) -> None:
+        """
+        Sketch profiling that only reads the rows with a key_column above the last profiled
+        one and merges them into the column sketches persisted by the previous run.
+        Assumes new rows get increasing keys, as id_sales does.
+        """
+        super().__init__(table_name, columns, **sketch_params)
+
+        base_path = os.getenv("FILE_PATH", ".")
+        self.key_column = key_column
+        self.state_path = state_path or os.path.join(base_path, f"{table_name}_profile_state.json")
+        self.state = self.load_state()
+        self.watermark = self.state.get("watermark")
+        self.new_watermark = self.watermark
+
+    def load_state(self):
+        """
+        Load the persisted column sketches, empty state on the first run
+        """
+        if not os.path.exists(self.state_path):
+            return {}
+
+        with open(self.state_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_state(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, self.state_path)
+
+        return f"Profile state saved as {self.state_path}"
+
+    def new_rows_query(self):
+        """
+        Query and parameters reading only the rows above the watermark, the whole table on the first run
+
+        Returns:
+        tuple: (query, params) for extract_db_staging
+        """
+        if self.watermark is None:
+            return f"select * from {self.table_name}", None
+
+        return f"select * from {self.table_name} where {self.key_column} > :watermark", {"watermark": self.watermark}
+
+    def update(self, chunk):
+        """
+        Add the rows of a chunk that weren't profiled yet
+        """
+        keys = pd.to_numeric(chunk[self.key_column], errors='coerce')
+
+        # new_rows_query already filters in the database, this only guards against a full table being passed
+        if self.watermark is not None:
+            new_rows = keys > self.watermark
+            chunk, keys = chunk[new_rows], keys[new_rows]
+
+        if keys.notnull().any():
+            chunk_max = float(keys.max())
+            self.new_watermark = chunk_max if self.new_watermark is None else max(self.new_watermark, chunk_max)
+
+        super().update(chunk)
+
+    def drift(self, previous: dict) -> dict:
+        """
+        Compare the new rows with everything profiled before them
+        """
+        drift = {}
+
+        for col, batch in self.sketches.items():
+            before = previous.get(col)
+            if before is None or before.count == 0 or batch.count == 0:
+                continue
+
+            drift[col] = {"missing_rate": {"before": before.missing / before.count,
+                                           "new_rows": batch.missing / batch.count}}
+
+            if batch.numeric and before.numeric:
+                drift[col]["negative_rate"] = {"before": before.negative / before.count,
+                                               "new_rows": batch.negative / batch.count}
+                drift[col]["min_value"] = {"before": before.minimum, "new_rows": batch.minimum}
+                drift[col]["max_value"] = {"before": before.maximum, "new_rows": batch.maximum}
+
+            if batch.categorical and before.categorical:
+                top_before = before.frequent.top()
+                drift[col]["new_top_values"] = [value for value in batch.frequent.top() if value not in top_before]
+
+        return drift
+
+    def reporting(self):
+        """
+        Merge the new rows into the persisted sketches, then report the totals,
+        the new rows alone and their drift from the previous data
+        """
+        previous = {col: ColumnSketch.from_dict(state) for col, state in self.state.get("columns", {}).items()}
+
+        new_rows_report = self.compute_metrics()
+        drift = self.drift(previous)
+        new_rows = max((sketch.count for sketch in self.sketches.values()), default=0)
+
+        # Merge only sketches built with the same settings, otherwise start over for that column
+        for col, batch in self.sketches.items():
+            before = previous.get(col)
+            if before is not None and (before.categorical, before.numeric, before.params) == (batch.categorical, batch.numeric, batch.params):
+                before.merge(batch)
+                self.sketches[col] = before
+
+        self.dict_report = {
+            "created_at": datetime.now().strftime("%Y-%m-%d"),
+            "approximate": True,
+            "error_bounds": self.sketch_params,
+            "new_rows": new_rows,
+            "report": self.compute_metrics(),
+            "new_rows_report": new_rows_report,
+            "drift": drift
+        }
+
+        self.state = {
+            "watermark": self.new_watermark,
+            "updated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "columns": {col: sketch.to_dict() for col, sketch in self.sketches.items()}
+        }
+
+        print(self.dict_report)
+        save_result = self.save_report()
+        save_state = self.save_state()
+
+        return self.dict_report
@@ -0,0 +1,56 @@
+from dotenv import load_dotenv
+from functools import lru_cache
+import re
+import os
+
+load_dotenv()
+
+# DDL of the warehouse tables, the target types of the transform are read from it
+WAREHOUSE_DDL_PATH = os.getenv("WAREHOUSE_DDL_PATH",
+                               os.path.join(os.path.dirname(__file__), "..", "..", "warehouse_data", "init.sql"))
+
+# Postgres column type -> compact pandas dtype holding it (nullable integers keep NULL without turning float)
+PG_TO_PANDAS = {
+    "int2": "Int16", "smallint": "Int16",
+    "int4": "Int32", "integer": "Int32", "int": "Int32", "serial4": "Int32",
+    "int8": "Int64", "bigint": "Int64", "serial8": "Int64",
+    "float4": "float32", "real": "float32",
+    "float8": "float64", "double": "float64", "numeric": "float64",
+    "varchar": "object", "text": "object", "bpchar": "object",
+}
+
+
+@lru_cache(maxsize=None)
+def table_schema(table_name: str, ddl_path: str = None) -> dict:
+    """
+    Columns of a table in the DDL file, in order, with their Postgres type
+
+    Returns:
+    dict: {column: postgres type}
+    """
+    with open(ddl_path or WAREHOUSE_DDL_PATH, encoding="utf-8") as f:
+        ddl = f.read()
+
+    match = re.search(rf"CREATE TABLE\s+(?:\w+\.)?{re.escape(table_name)}\s*\((.*?)\n\);", ddl, re.S | re.I)
+    if match is None:
+        raise Exception(f"Table {table_name} not found in {ddl_path or WAREHOUSE_DDL_PATH}")
+
+    columns = {}
+    for line in match.group(1).splitlines():
+        column = re.match(r'\s*"?(\w+)"?\s+(\w+)', line)
+        if column and column.group(1).upper() not in ("CONSTRAINT", "PRIMARY", "UNIQUE"):
+            columns[column.group(1)] = column.group(2).lower()
+
+    return columns
+
+
+def target_dtypes(table_name: str, ddl_path: str = None) -> dict:
+    """
+    Pandas dtype of every column of the table that the transform can produce
+    (uuid, timestamp, ... columns filled by the database are left out)
+
+    Returns:
+    dict: {column: pandas dtype}
+    """
+    return {column: PG_TO_PANDAS[pg_type] for column, pg_type in table_schema(table_name, ddl_path).items()
+            if pg_type in PG_TO_PANDAS}
@@ -0,0 +1,308 @@
+import pandas as pd
+import numpy as np
+import base64
+import math
+import zlib
+
+
+def _pack(array: np.ndarray) -> str:
+    return base64.b64encode(zlib.compress(array.tobytes())).decode("ascii")
+
+
+def _unpack(text: str, dtype, shape) -> np.ndarray:
+    return np.frombuffer(zlib.decompress(base64.b64decode(text)), dtype=dtype).reshape(shape).copy()
+
+
+def hash_values(values: np.ndarray) -> np.ndarray:
+    """
+    64-bit hash of the string form of each value, stable across chunks and runs
+    """
+    return pd.util.hash_array(np.asarray(values, dtype=object).astype(str).astype(object))
+
+
+class HyperLogLog:
+    def __init__(self, error_rate: float = 0.01) -> None:
+        """
+        Distinct count estimator
+
+        Parameters:
+        -----------
+        error_rate : float, default=0.01
+            Target relative standard error of the estimate (1.04 / sqrt(registers))
+        """
+        self.p = max(4, min(18, math.ceil(math.log2((1.04 / error_rate) ** 2))))
+        self.m = 1 << self.p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    def update(self, hashes: np.ndarray):
+        """
+        Add 64-bit hashes: the first p bits pick the register, the rank of the
+        first set bit of the rest is kept if it is the highest seen
+        """
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        rest_bits = 64 - self.p
+
+        index = (hashes >> np.uint64(rest_bits)).astype(np.int64)
+        rest = hashes & np.uint64((1 << rest_bits) - 1)
+
+        # frexp exponent is the bit length of the remaining bits
+        _, bit_length = np.frexp(rest.astype(np.float64))
+        rank = np.where(rest == 0, rest_bits + 1, rest_bits - bit_length + 1).astype(np.uint8)
+
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: "HyperLogLog"):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+
+        # Small range correction (linear counting)
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * self.m and zeros:
+            estimate = self.m * math.log(self.m / zeros)
+
+        return int(round(estimate))
+
+
+class CountMinTopK:
+    def __init__(self, epsilon: float = 0.001, delta: float = 0.01, k: int = 10) -> None:
+        """
+        Frequency estimator keeping the k most frequent values
+
+        Parameters:
+        -----------
+        epsilon : float, default=0.001
+            Counts are overestimated by at most epsilon * total count ...
+        delta : float, default=0.01
+            ... with probability 1 - delta
+        k : int, default=10
+            Number of frequent values to keep
+        """
+        self.width = math.ceil(math.e / epsilon)
+        self.depth = math.ceil(math.log(1 / delta))
+        self.k = k
+        self.table = np.zeros((self.depth, self.width), dtype=np.int64)
+        self.candidates = {}
+
+    def _columns(self, hashes: np.ndarray) -> list:
+        # Derive one hash per row from the two 32-bit halves (Kirsch-Mitzenmacher)
+        low = hashes & np.uint64(0xFFFFFFFF)
+        high = hashes >> np.uint64(32)
+
+        return [((low + np.uint64(row) * high) % np.uint64(self.width)).astype(np.int64)
+                for row in range(self.depth)]
+
+    def estimate(self, hashes: np.ndarray) -> np.ndarray:
+        hashes = np.asarray(hashes, dtype=np.uint64)
+
+        return np.min([self.table[row, columns] for row, columns in enumerate(self._columns(hashes))], axis=0)
+
+    def update(self, values: np.ndarray, hashes: np.ndarray, counts: np.ndarray):
+        """
+        Add distinct values with their hashes and their number of occurrences
+        """
+        hashes = np.asarray(hashes, dtype=np.uint64)
+
+        for row, columns in enumerate(self._columns(hashes)):
+            np.add.at(self.table[row], columns, counts)
+
+        # Only the values frequent in this chunk can enter the top k
+        top = np.argsort(-counts, kind="stable")[:self.k]
+        for i in top:
+            self.candidates[values[i]] = hashes[i]
+
+        self._prune()
+
+    def merge(self, other: "CountMinTopK"):
+        self.table += other.table
+        self.candidates.update(other.candidates)
+        self._prune()
+
+    def _prune(self):
+        if len(self.candidates) <= self.k:
+            return
+
+        values = list(self.candidates)
+        estimates = self.estimate(np.array([self.candidates[value] for value in values], dtype=np.uint64))
+        keep = np.argsort(-estimates, kind="stable")[:self.k]
+        self.candidates = {values[i]: self.candidates[values[i]] for i in keep}
+
+    def top(self) -> dict:
+        if not self.candidates:
+            return {}
+
+        values = list(self.candidates)
+        estimates = self.estimate(np.array([self.candidates[value] for value in values], dtype=np.uint64))
+        order = np.argsort(-estimates, kind="stable")
+
+        return {values[i]: int(estimates[i]) for i in order}
+
+
+class Reservoir:
+    def __init__(self, size: int = 20, seed: int = 42) -> None:
+        """
+        Uniform random sample of at most size values from a stream
+        """
+        self.size = size
+        self.seen = 0
+        self.sample = []
+        self.rng = np.random.default_rng(seed)
+
+    def update(self, values: np.ndarray):
+        values = np.asarray(values, dtype=object)
+
+        # Fill the reservoir first
+        fill = max(0, min(self.size - len(self.sample), len(values)))
+        self.sample.extend(values[:fill].tolist())
+        self.seen += fill
+
+        rest = values[fill:]
+        if len(rest) == 0:
+            return
+
+        # Item number n replaces a random slot with probability size / n
+        positions = np.arange(self.seen, self.seen + len(rest))
+        slots = self.rng.integers(0, positions + 1)
+        replaced = np.flatnonzero(slots < self.size)
+        for i in replaced:
+            self.sample[slots[i]] = rest[i]
+
+        self.seen += len(rest)
+
+    def merge(self, other: "Reservoir"):
+        total = self.seen + other.seen
+        if total == 0:
+            return
+
+        # Draw each slot from one of the two samples, proportionally to what they have seen
+        merged = []
+        mine, theirs = list(self.sample), list(other.sample)
+        self.rng.shuffle(mine)
+        self.rng.shuffle(theirs)
+        while len(merged) < self.size and (mine or theirs):
+            if mine and (not theirs or self.rng.random() < self.seen / total):
+                merged.append(mine.pop())
+            else:
+                merged.append(theirs.pop())
+
+        self.sample = merged
+        self.seen = total
+
+
+class ColumnSketch:
+    def __init__(self, categorical: bool = True, numeric: bool = False, error_rate: float = 0.01,
+                 epsilon: float = 0.001, delta: float = 0.01, top_k: int = 10, sample_size: int = 20) -> None:
+        """
+        Mergeable summary of one column, updated chunk by chunk
+
+        Parameters:
+        -----------
+        categorical : bool, default=True
+            Track distinct count (HyperLogLog), frequent values (Count-Min) and a sample
+        numeric : bool, default=False
+            Track negative count, min and max of the values converted to numbers
+        """
+        self.categorical = categorical
+        self.numeric = numeric
+        self.params = {"error_rate": error_rate, "epsilon": epsilon, "delta": delta,
+                       "top_k": top_k, "sample_size": sample_size}
+        self.data_type = None
+        self.count = 0
+        self.missing = 0
+        self.negative = 0
+        self.minimum = None
+        self.maximum = None
+
+        if categorical:
+            self.hll = HyperLogLog(error_rate)
+            self.frequent = CountMinTopK(epsilon, delta, top_k)
+            self.reservoir = Reservoir(sample_size)
+
+    def update(self, values: pd.Series):
+        if self.data_type is None:
+            self.data_type = str(values.dtype)
+
+        self.count += len(values)
+        self.missing += int(values.isnull().sum())
+
+        if self.categorical:
+            # Exact counts inside the chunk, so the sketches only see each distinct value once
+            keys = pd.Series(values.to_numpy(dtype=object).astype(str))
+            chunk_counts = keys.value_counts()
+            distinct = chunk_counts.index.to_numpy(dtype=object)
+            hashes = hash_values(distinct)
+
+            self.hll.update(hashes)
+            self.frequent.update(distinct, hashes, chunk_counts.to_numpy(dtype=np.int64))
+            self.reservoir.update(values.to_numpy(dtype=object))
+
+        if self.numeric:
+            numbers = values if pd.api.types.is_numeric_dtype(values) else pd.to_numeric(values, errors='coerce')
+            self.negative += int((numbers < 0).sum())
+
+            if numbers.notnull().any():
+                chunk_min, chunk_max = float(numbers.min()), float(numbers.max())
+                self.minimum = chunk_min if self.minimum is None else min(self.minimum, chunk_min)
+                self.maximum = chunk_max if self.maximum is None else max(self.maximum, chunk_max)
+
+    def merge(self, other: "ColumnSketch"):
+        self.data_type = self.data_type or other.data_type
+        self.count += other.count
+        self.missing += other.missing
+        self.negative += other.negative
+
+        for attr, pick in (("minimum", min), ("maximum", max)):
+            values = [value for value in (getattr(self, attr), getattr(other, attr)) if value is not None]
+            setattr(self, attr, pick(values) if values else None)
+
+        if self.categorical and other.categorical:
+            self.hll.merge(other.hll)
+            self.frequent.merge(other.frequent)
+            self.reservoir.merge(other.reservoir)
+
+    def distinct(self) -> int:
+        # The estimate can't exceed the number of rows seen
+        return min(self.hll.count(), self.count)
+
+    def to_dict(self) -> dict:
+        """
+        Compact JSON-serializable state, the sketch arrays are zlib compressed and base64 encoded
+        """
+        state = {
+            "categorical": self.categorical,
+            "numeric": self.numeric,
+            "params": self.params,
+            "data_type": self.data_type,
+            "count": self.count,
+            "missing": self.missing,
+            "negative": self.negative,
+            "minimum": self.minimum,
+            "maximum": self.maximum,
+        }
+
+        if self.categorical:
+            state["hll"] = _pack(self.hll.registers)
+            state["count_min"] = _pack(self.frequent.table)
+            state["candidates"] = {value: str(hashed) for value, hashed in self.frequent.candidates.items()}
+            state["sample"] = self.reservoir.sample
+            state["seen"] = self.reservoir.seen
+
+        return state
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "ColumnSketch":
+        sketch = cls(state["categorical"], state["numeric"], **state["params"])
+
+        for attr in ("data_type", "count", "missing", "negative", "minimum", "maximum"):
+            setattr(sketch, attr, state[attr])
+
+        if sketch.categorical:
+            sketch.hll.registers = _unpack(state["hll"], np.uint8, sketch.hll.registers.shape)
+            sketch.frequent.table = _unpack(state["count_min"], np.int64, sketch.frequent.table.shape)
+            sketch.frequent.candidates = {value: np.uint64(int(hashed)) for value, hashed in state["candidates"].items()}
+            sketch.reservoir.sample = list(state["sample"])
+            sketch.reservoir.seen = state["seen"]
+
+        return sketch
@@ -1,7 +1,113 @@
 from src.utils.load_log import LOAD_LOG
+from src.utils.categorical import is_categorical, lower_categorical
+from src.warehouse.schema import target_dtypes
 from datetime import datetime
 
 import pandas as pd
+import numpy as np
+
+# Daftar kolom yang dipilih (TANPA brand_car!)
+SELECTED_COLUMNS = [
+    "id_sales", "year", "brand_car_id", "transmission", "id_state", "odometer", 
+    "condition", "color", "interior", "mmr", "sellingprice"
+]
+
+# Dictionary mapping nama kolom original ke nama kolom baru
+COLUMN_MAPPING = {
+    "id_sales": "id_sales_nk",
+    "sellingprice": "selling_price"
+}
+
+
+# Postgres type the ELT casts to, for each pandas dtype of cast_frame
+PANDAS_TO_PG = {"Int16": "int2", "Int32": "int4", "Int64": "int8", "float32": "float4", "float64": "float8"}
+
+
+def source_dtypes(table_name: str = "car_sales") -> dict:
+    """
+    Target dtypes of the DDL keyed by the column names before rename_columns
+    """
+    source_names = {new: old for old, new in COLUMN_MAPPING.items()}
+
+    return {source_names.get(col, col): dtype for col, dtype in target_dtypes(table_name).items()}
+
+
+def cast_frame(data: pd.DataFrame, report: dict = None, table_name: str = "car_sales") -> pd.DataFrame:
+    """
+    Cast the columns of data to the types of the warehouse table in its DDL, using compact
+    dtypes: nullable Int32 for int4 (missing values don't turn it into float), float32 for float4.
+    Values that are not numbers (coerced) or don't fit the target type, e.g. a fraction in an
+    integer column (failed), become missing.
+
+    Parameters:
+    -----------
+    report : dict, default=None
+        If given, the counts are added to it: {column: {"coerced": n, "failed": n}}
+
+    Returns:
+    pd.DataFrame: The cast data
+    """
+    converted = {}
+    for column, dtype in source_dtypes(table_name).items():
+        if column not in data.columns:
+            continue
+
+        values = data[column]
+        coerced, failed = 0, 0
+
+        if dtype == "object":
+            # Categorical string columns stay dictionary-encoded
+            if not is_categorical(values):
+                converted[column] = values.astype("object")
+
+        else:
+            # Konversi ke numerik, dengan coercing errors menjadi NaN
+            numbers = values if pd.api.types.is_numeric_dtype(values) else pd.to_numeric(values, errors='coerce')
+            coerced = int((values.notna() & numbers.isna()).sum())
+
+            if dtype.startswith("Int"):
+                limits = np.iinfo(dtype.lower())
+                numbers = numbers.astype("Float64")
+                fits = (numbers % 1 == 0) & (numbers >= limits.min) & (numbers <= limits.max)
+            else:
+                # A finite value beyond the float32 range would become inf
+                as_float = numbers.astype("float64")
+                fits = (as_float.abs() <= np.finfo(dtype).max) | ~np.isfinite(as_float)
+
+            unfit = numbers.notna() & ~fits.fillna(True)
+            failed = int(unfit.sum())
+
+            converted[column] = numbers.mask(unfit).astype(dtype)
+
+        if report is not None:
+            counts = report.setdefault(column, {"coerced": 0, "failed": 0})
+            counts["coerced"] += coerced
+            counts["failed"] += failed
+
+    return data.assign(**converted)
+
+
+def cast_summary(report: dict) -> str:
+    """
+    The columns of a cast report that lost values, e.g. "year: 3 coerced, 1 failed"
+    """
+    return "; ".join(f"{col}: {counts['coerced']} coerced, {counts['failed']} failed"
+                     for col, counts in report.items() if counts["coerced"] or counts["failed"])
+
+
+def add_cast_report(total: dict, report: dict, table_name: str):
+    """
+    Add the counts of one cast to the running total and print the columns that lost values
+    """
+    for col, counts in report.items():
+        column_total = total.setdefault(col, {"coerced": 0, "failed": 0})
+        column_total["coerced"] += counts["coerced"]
+        column_total["failed"] += counts["failed"]
+
+    if cast_summary(report):
+        print(f"Cast {table_name}: {cast_summary(report)}")
+
+
 class Transformation():
 
 
@@ -9,6 +115,7 @@ class Transformation():
         self.data = data
         self.table_name = table_name
         self.columns = data.columns
+        self.cast_report = {}
 
     
     def drop_missing_value(self, col_name):
@@ -92,7 +199,11 @@ class Transformation():
 
             # Ubah semua nilai di kolom yang ditentukan menjadi huruf kapital
             for col_name in col_names:
-                self.data[col_name] = self.data[col_name].str.lower()
+                # Categorical columns are lower cased over their categories only
+                if is_categorical(self.data[col_name]):
+                    self.data[col_name] = lower_categorical(self.data[col_name])
+                else:
+                    self.data[col_name] = self.data[col_name].str.lower()
 
             # Update column information
             self.columns = self.data.columns
@@ -180,19 +291,13 @@ class Transformation():
 
     def select_merged_columns(self):
         try:
-            # Daftar kolom yang dipilih (TANPA brand_car!)
-            selected_columns = [
-                "id_sales", "year", "brand_car_id", "transmission", "id_state", "odometer", 
-                "condition", "color", "interior", "mmr", "sellingprice"
-            ]
-            
             # Cek kolom yang tersedia
-            for col in selected_columns:
+            for col in SELECTED_COLUMNS:
                 if col not in self.data.columns:
                     print(f"Warning: Column '{col}' not found in dataframe")
             
             # Filter hanya kolom yang benar-benar ada
-            valid_columns = [col for col in selected_columns if col in self.data.columns]
+            valid_columns = [col for col in SELECTED_COLUMNS if col in self.data.columns]
             
             # Memperbarui self.data secara internal
             self.data = self.data[valid_columns]
@@ -227,46 +332,9 @@ class Transformation():
 
     def cast_columns(self):
         try:
-            # Dictionary mapping tipe data string ke tipe data pandas
-            type_mapping = {
-                "integer": "int64",
-                "float": "float64",
-                "string": "object"
-            }
-            
-            # Dictionary kolom dan tipe data target
-            data_types = {
-                "id_sales": "integer",
-                "year": "integer",
-                "brand_car_id": "integer",
-                "transmission": "string",
-                "id_state": "integer",
-                "condition": "float", 
-                "odometer": "float",
-                "color": "string",
-                "interior": "string",
-                "mmr": "float",
-                "sellingprice": "float"
-            }
-            
-            # Seleksi hanya kolom yang ada di dataframe
-            existing_columns = [col for col in data_types.keys() if col in self.data.columns]
-            
-            # Lakukan casting untuk setiap kolom
-            for column in existing_columns:
-                try:
-                    target_type = type_mapping[data_types[column]]
-                    
-                    # Tangani nilai yang mungkin error saat konversi
-                    if data_types[column] in ["integer", "float"]:
-                        # Konversi ke numerik, dengan coercing errors menjadi NaN
-                        self.data[column] = pd.to_numeric(self.data[column], errors='coerce')
-                    
-                    # Terapkan tipe data
-                    self.data[column] = self.data[column].astype(target_type)
-                    
-                except Exception as e:
-                    print(f"Error casting column {column}: {str(e)}")
+            report = {}
+            self.data = cast_frame(self.data, report)
+            add_cast_report(self.cast_report, report, self.table_name)
             
             # Logging message
             log_msg = {
@@ -296,14 +364,8 @@ class Transformation():
 
     def rename_columns(self):
         try:
-            # Dictionary mapping nama kolom original ke nama kolom baru
-            column_mapping = {
-                "id_sales": "id_sales_nk",
-                "sellingprice": "selling_price"
-            }
-            
             # Filter hanya kolom yang ada di dataframe
-            valid_columns = {k: v for k, v in column_mapping.items() if k in self.data.columns}
+            valid_columns = {k: v for k, v in COLUMN_MAPPING.items() if k in self.data.columns}
             
             # Rename kolom
             if valid_columns:
@@ -340,3 +402,275 @@ class Transformation():
 
 
         
+
+
+
+class TransformationPlan():
+    """
+    Lazy version of Transformation: the steps are recorded first and then applied
+    in one fused pass by execute(). All row filters become one combined mask, only
+    the columns needed by select_merged_columns are copied (before the joins), and
+    the lookup tables are reduced to their key and id before merging.
+
+    Steps are applied in the order of Transformation: filters, lower case, join,
+    select, cast, rename. Recording them in another order raises an error.
+    """
+
+    STEP_ORDER = ["drop_missing_value", "drop_invalid_value", "to_lower_case", "join_data",
+                  "select_merged_columns", "cast_columns", "rename_columns"]
+
+    def __init__(self, table_name: str) -> None:
+        self.table_name = table_name
+        self.steps = []
+        self.cast_report = {}
+
+    def _record(self, step: str, *args):
+        last_step = self.steps[-1][0] if self.steps else None
+        if last_step is not None and self.STEP_ORDER.index(step) < self.STEP_ORDER.index(last_step):
+            raise Exception(f"Step {step} can't be applied after {last_step}")
+
+        self.steps.append((step, args))
+        return self
+
+    def drop_missing_value(self, col_name):
+        if isinstance(col_name, str):
+            col_name = [col_name]
+        return self._record("drop_missing_value", list(col_name))
+
+    def drop_invalid_value(self, col_names: list, invalid_values: list):
+        return self._record("drop_invalid_value", list(col_names), list(invalid_values))
+
+    def to_lower_case(self, col_names: list):
+        return self._record("to_lower_case", list(col_names))
+
+    def join_data(self, df1, df2):
+        """
+        df1 / df2 are the car_brand / us_state DataFrames, or their DimensionLookup indexes
+        """
+        return self._record("join_data", df1, df2)
+
+    def select_merged_columns(self):
+        return self._record("select_merged_columns")
+
+    def cast_columns(self):
+        return self._record("cast_columns")
+
+    def rename_columns(self):
+        return self._record("rename_columns")
+
+    def compile_sql(self, table_name: str, table_columns: list):
+        """
+        Push the leading filter and lower case steps, and the projection, down into
+        one SQL query on the staging table. The first step that can't be pushed
+        (e.g. it uses a column the table doesn't have) and every step after it stay
+        in pandas. Note that postgres lower() is used for the pushed lower case steps.
+
+        Returns:
+        tuple: (query, bound parameters, TransformationPlan with the remaining steps)
+        """
+        conditions, params, lowered = [], {}, set()
+        residual = TransformationPlan(self.table_name)
+
+        pushing = True
+        for step, args in self.steps:
+            pushable = step in ("drop_missing_value", "drop_invalid_value", "to_lower_case") \
+                and all(col in table_columns for col in args[0])
+
+            if not (pushing and pushable):
+                pushing = False
+                residual.steps.append((step, args))
+
+            elif step == "drop_missing_value":
+                conditions += [f'"{col}" IS NOT NULL' for col in args[0]]
+
+            elif step == "drop_invalid_value" and args[1]:
+                names = []
+                for value in args[1]:
+                    names.append(f":p{len(params)}")
+                    params[f"p{len(params)}"] = value
+
+                # NULL is not an invalid value, pandas isin() keeps those rows too
+                conditions += [f'coalesce("{col}" NOT IN ({", ".join(names)}), true)' for col in args[0]]
+
+            elif step == "to_lower_case":
+                lowered.update(args[0])
+
+        # Projection: the selected columns, the join keys and whatever the remaining steps use
+        residual_steps = dict(residual.steps)
+        if "select_merged_columns" in residual_steps:
+            needed = set(SELECTED_COLUMNS)
+            if "join_data" in residual_steps:
+                needed.update(["brand_car", "state"])
+            for step, args in residual.steps:
+                if step in ("drop_missing_value", "drop_invalid_value", "to_lower_case"):
+                    needed.update(args[0])
+
+            columns = [col for col in table_columns if col in needed]
+        else:
+            columns = list(table_columns)
+
+        select_list = ", ".join(f'lower("{col}") AS "{col}"' if col in lowered else f'"{col}"' for col in columns)
+
+        query = f"SELECT {select_list} FROM {table_name}"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+
+        return query, params, residual
+
+    def compile_elt(self, table_name: str, table_columns: list, brand_table: str, state_table: str,
+                    target_table: str = "car_sales"):
+        """
+        Compile the whole plan into one SELECT, so the transform runs in the database.
+        brand_table and state_table are the lookup relations of join_data (a table or a
+        parenthesized query) exposing brand_name / brand_car_id and code / id_state.
+        The casts follow cast_frame: the types of target_table in the DDL, with invalid numbers
+        (coerced) and values that don't fit the type (failed) becoming NULL.
+
+        Returns:
+        tuple: (query, bound parameters)
+        """
+        query, params, residual = self.compile_sql(table_name, table_columns)
+
+        residual_steps = dict(residual.steps)
+        for step in residual_steps:
+            if step not in ("join_data", "select_merged_columns", "cast_columns", "rename_columns"):
+                raise Exception(f"Step {step} can't run in the database (missing column?)")
+
+        from_clause = f"({query}) s"
+        if "join_data" in residual_steps:
+            from_clause += (f' LEFT JOIN {brand_table} b ON s."brand_car" = b."brand_name"'
+                            f' LEFT JOIN {state_table} st ON s."state" = st."code"')
+
+        number = r"^\s*[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?\s*$"
+        columns = SELECTED_COLUMNS if "select_merged_columns" in residual_steps else table_columns
+
+        dtypes = source_dtypes(target_table) if "cast_columns" in residual_steps else {}
+
+        # The inner select parses the numbers (NULL if invalid), the outer one keeps those that fit the type
+        parsed_list, select_list = [], []
+        for col in columns:
+            expression = f'"{col}"'
+            dtype = dtypes.get(col)
+
+            if dtype is not None and dtype != "object":
+                parsed_list.append(f"CASE WHEN {expression}::text ~ '{number}' THEN trim({expression}::text)::float8 END AS {expression}")
+
+                if dtype.startswith("Int"):
+                    limits = np.iinfo(dtype.lower())
+                    fits = f"{expression} = trunc({expression}) AND {expression} BETWEEN {limits.min} AND {limits.max}"
+                elif dtype == "float32":
+                    fits = f"abs({expression}) <= {float(np.finfo(np.float32).max)!r}"
+                else:
+                    fits = "true"
+
+                expression = f"CASE WHEN {fits} THEN {expression}::{PANDAS_TO_PG[dtype]} END"
+            else:
+                parsed_list.append(expression)
+                if dtype == "object":
+                    expression = f"{expression}::varchar"
+
+            name = COLUMN_MAPPING.get(col, col) if "rename_columns" in residual_steps else col
+            select_list.append(f'{expression} AS "{name}"')
+
+        return f"SELECT {', '.join(select_list)} FROM (SELECT {', '.join(parsed_list)} FROM {from_clause}) n", params
+
+    def _row_mask(self, data: pd.DataFrame):
+        """
+        One boolean mask for every drop_missing_value and drop_invalid_value step
+        """
+        mask = pd.Series(True, index=data.index)
+
+        for step, args in self.steps:
+            if step == "drop_missing_value":
+                mask &= data[args[0]].notna().all(axis=1)
+
+            elif step == "drop_invalid_value":
+                mask &= ~data[args[0]].isin(args[1]).any(axis=1)
+
+        return mask
+
+    def execute(self, data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Apply the recorded steps to data in one pass, data itself is not modified
+
+        Returns:
+        pd.DataFrame: The transformed data
+        """
+        try:
+            steps = dict(self.steps)
+
+            join = steps.get("join_data")
+            join_keys = ["brand_car", "state"] if join is not None else []
+
+            # Projection pushdown: keep only the columns the selection (and the joins) need
+            if "select_merged_columns" in steps:
+                columns = [col for col in data.columns if col in SELECTED_COLUMNS or col in join_keys]
+            else:
+                columns = list(data.columns)
+
+            # One combined row filter, one copy of the surviving rows and columns
+            result = data.loc[self._row_mask(data), columns]
+
+            for step, args in self.steps:
+                if step == "to_lower_case":
+                    for col_name in args[0]:
+                        if col_name in result.columns and is_categorical(result[col_name]):
+                            result[col_name] = lower_categorical(result[col_name])
+                        elif col_name in result.columns:
+                            result[col_name] = result[col_name].str.lower()
+
+            if join is not None and all(hasattr(lookup, "lookup") for lookup in join):
+                # DimensionLookup indexes: vectorized key -> id mapping instead of merges
+                brand_lookup, state_lookup = join
+                result[brand_lookup.id_column] = brand_lookup.lookup(result["brand_car"])
+                result[state_lookup.id_column] = state_lookup.lookup(result["state"])
+
+            elif join is not None:
+                df_brand, df_state = join
+
+                # Only the key and the id of each lookup table are merged
+                brand_columns = ["brand_name"] + [col for col in SELECTED_COLUMNS if col in df_brand.columns]
+                state_columns = ["code"] + [col for col in SELECTED_COLUMNS if col in df_state.columns]
+                if "select_merged_columns" not in steps:
+                    brand_columns, state_columns = list(df_brand.columns), list(df_state.columns)
+
+                result = result.merge(df_brand[brand_columns], left_on="brand_car", right_on="brand_name", how="left")
+                result = result.merge(df_state[state_columns], left_on="state", right_on="code", how="left")
+
+            if "select_merged_columns" in steps:
+                for col in SELECTED_COLUMNS:
+                    if col not in result.columns:
+                        print(f"Warning: Column '{col}' not found in dataframe")
+
+                result = result.reindex(columns=[col for col in SELECTED_COLUMNS if col in result.columns])
+
+            if "cast_columns" in steps:
+                report = {}
+                result = cast_frame(result, report)
+                add_cast_report(self.cast_report, report, self.table_name)
+
+            if "rename_columns" in steps:
+                result.columns = [COLUMN_MAPPING.get(col, col) for col in result.columns]
+
+            log_msg = {
+                "step": "Warehouse",
+                "component": "Transformation (Fused Plan)",
+                "status": "success!",
+                "table_name": self.table_name,
+                "etl_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            }
+
+            return result
+
+        except Exception as e:
+            log_msg = {
+                "step": "Warehouse",
+                "component": "Transformation (Fused Plan)",
+                "status": "Failed!",
+                "table_name": self.table_name,
+                "etl_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "error_msg": str(e)
+            }
+
+        finally:
+            LOAD_LOG(log_msg)
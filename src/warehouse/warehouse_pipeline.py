@@ -1,85 +1,421 @@
-def Warehouse_Pipeline():
+import itertools
+import os
+
+
+## Transformation rules of df1 (car_sales data)
+missing_value_col = ["odometer", "mmr", "condition"]
+invalid_value_col = ["brand_car", "model", "trim", "body", "transmission", "vin", "state", "color", "interior", "seller"]
+invalid_value = ["", "—","3vwd17aj5fm219943", "3vwd17aj5fm297123"]
+to_lowercase_col = ["brand_car", "model", "trim", "body", "transmission", "color", "interior", "seller"]
+
+
+def car_sales_plan(df2_clean, df3_clean):
+    """
+    The car_sales transformation chain as a lazy TransformationPlan
+    """
+    from src.warehouse.transform import TransformationPlan
+
+    return (TransformationPlan(table_name="car_sales")
+            .drop_missing_value(missing_value_col)
+            .drop_invalid_value(invalid_value_col, invalid_value)
+            .to_lower_case(to_lowercase_col)
+            .join_data(df2_clean, df3_clean)
+            .select_merged_columns()
+            .cast_columns()
+            .rename_columns())
+
+
+def transform_car_sales(df1, df2_clean, df3_clean, mode: str = None, cast_report: dict = None):
+    """
+    Run the car_sales transformation chain on one DataFrame (the whole table or one chunk).
+    mode="fused" (default, or TRANSFORM_MODE) applies it as one TransformationPlan pass,
+    mode="eager" runs and logs each Transformation step on its own.
+    The coerced / failed cast counts are added to cast_report when it is given.
+    """
+    from src.warehouse.transform import Transformation
+
+    mode = (mode or os.getenv("TRANSFORM_MODE", "fused")).lower()
+
+    if mode == "fused":
+        df1_plan = car_sales_plan(df2_clean, df3_clean)
+        if cast_report is not None:
+            df1_plan.cast_report = cast_report
+        return df1_plan.execute(df1)
+
+    df1_transform = Transformation(data=df1, table_name="car_sales")
+    if cast_report is not None:
+        df1_transform.cast_report = cast_report
+
+    df1_clean = df1_transform.drop_missing_value(missing_value_col)
+    df1_clean = df1_transform.drop_invalid_value(invalid_value_col, invalid_value)
+    df1_clean = df1_transform.to_lower_case(to_lowercase_col)
+
+    ## Merged Dataframe df1, df2 and df3
+    df1_clean = df1_transform.join_data(df2_clean, df3_clean)
+
+    # Select only necessary column based on data warehouse schema
+    df1_clean = df1_transform.select_merged_columns()
+
+
+    # Cast column based on data warehouse schema
+    df1_clean = df1_transform.cast_columns()
+
+    # Renaming column based on data warehouse schema
+    df1_clean = df1_transform.rename_columns()
+
+    return df1_clean
+
+
+# Lookup tables of the transform, set once in each partition worker process
+_partition_lookups = None
+
+
+def _init_partition_worker(df2_clean, df3_clean):
+    from multiprocessing.util import Finalize
+    from src.utils.load_log import shutdown_log
+
+    global _partition_lookups
+    _partition_lookups = (df2_clean, df3_clean)
+
+    # Worker processes skip atexit, flush their queued log messages on exit instead
+    Finalize(None, shutdown_log, exitpriority=10)
+
+
+def _transform_partition(bounds: tuple):
+    """
+    Extract and transform the car_sales rows with low <= id_sales < high (runs in a worker process)
+
+    Returns:
+    tuple: (transformed rows, unmatched (rows, keys) of each dimension lookup, cast report)
+
+    Raises:
+    Exception: If the extract or the transform of the range failed, they log their error and return None
+    """
+    from src.warehouse.extract import extract_db_staging
+
+    low, high = bounds
+    df1 = extract_db_staging("car_sales", query="select * from car_sales where id_sales >= :low and id_sales < :high",
+                             params={"low": low, "high": high})
+    if df1 is None:
+        raise Exception(f"Extracting car_sales ids {low}..{high - 1} failed, see etl_log")
+
+    cast_report = {}
+    df1_clean = transform_car_sales(df1, *_partition_lookups, cast_report=cast_report)
+    if df1_clean is None:
+        raise Exception(f"Transforming car_sales ids {low}..{high - 1} failed, see etl_log")
+
+    unmatched = []
+    for lookup in _partition_lookups:
+        if hasattr(lookup, "lookup"):
+            unmatched.append((lookup.unmatched_rows, lookup.unmatched_keys))
+            lookup.unmatched_rows, lookup.unmatched_keys = 0, set()
+
+    return df1_clean, unmatched, cast_report
+
+
+def id_ranges(low: int, high: int, partitions: int) -> list:
+    """
+    Split [low, high] into at most partitions contiguous [start, end) ranges
+    """
+    step = max(1, -(-(high - low + 1) // partitions))
+
+    return [(start, min(start + step, high + 1)) for start in range(low, high + 1, step)]
+
+
+def transform_partitioned(df2_clean, df3_clean, workers: int, partitions: int = None, cast_report: dict = None):
+    """
+    Transform car_sales by id_sales range in a pool of worker processes. Each worker
+    extracts and transforms its own ranges, the results are yielded as they complete.
+    The cast counts of every partition are added to cast_report when it is given.
+    A failed partition is logged as a failed transform and raised, so the load stops.
+    """
+    from src.utils.engine import init_engine
+    from src.utils.load_log import LOAD_LOG
+    from src.utils.parallel import process_map
+    from src.warehouse.transform import add_cast_report
+    from sqlalchemy import text
+    from datetime import datetime
+
+    with init_engine("staging").connect() as conn:
+        low, high = conn.execute(text("select min(id_sales), max(id_sales) from car_sales")).fetchone()
+
+    if low is None:
+        return
+
+    ranges = id_ranges(int(low), int(high), partitions or 4 * workers)
+    print(f"Transforming car_sales ids {low}..{high} in {len(ranges)} partitions on {workers} processes")
+
+    try:
+        for df1_clean, unmatched, partition_cast_report in process_map(_transform_partition, ranges, workers,
+                                                initializer=_init_partition_worker, initargs=(df2_clean, df3_clean)):
+            # Add the unmatched keys seen by the workers to the lookups of this process
+            lookups = [lookup for lookup in (df2_clean, df3_clean) if hasattr(lookup, "lookup")]
+            for lookup, (rows, keys) in zip(lookups, unmatched):
+                lookup.unmatched_rows += rows
+                lookup.unmatched_keys.update(keys)
+
+            if cast_report is not None:
+                add_cast_report(cast_report, partition_cast_report, "car_sales")
+
+            yield df1_clean
+
+    except Exception as e:
+        LOAD_LOG({
+            "step": "Warehouse",
+            "component": "Transformation (Partitioned)",
+            "status": "Failed!",
+            "table_name": "car_sales",
+            "etl_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "error_msg": str(e)
+        })
+        print(f"Transforming car_sales failed: {e}")
+        raise
+
+
+def Warehouse_Pipeline(chunksize: int = None, profile: bool = True, transform: bool = True):
+    """
+    Build the warehouse car_sales table from staging.
+    profile and transform select which part runs, so both can be scheduled separately.
+
+    Returns:
+    bool: True if every selected step succeeded
+    """
 
     #Import relevant Module
     from src.warehouse.extract import extract_db_staging
-    from src.warehouse.profiling import Profiling
-    from src.warehouse.transform import Transformation
+    from src.warehouse.profiling import Profiling, SketchProfiling, IncrementalProfiling
+    from src.warehouse.transform import Transformation, cast_summary
     from src.warehouse.load import load_to_warehouse
+    from src.warehouse.lookup import DimensionLookup
+    from src.utils.artifacts import ArtifactWriter, artifacts_enabled, has_artifact, read_artifact
+
+    # Streaming mode extracts, transforms and loads car_sales in chunks of this many rows
+    if chunksize is None and os.getenv("EXTRACT_CHUNKSIZE"):
+        chunksize = int(os.getenv("EXTRACT_CHUNKSIZE"))
+
+    # Pushdown runs the filters, lower case and projection of the transform in the staging query,
+    # not needed when car_sales is read from its local snapshot
+    pushdown = transform and os.getenv("TRANSFORM_PUSHDOWN", "false").lower() == "true" \
+        and not has_artifact("staging/car_sales")
+
+    # ELT mode runs the whole transform and load as one SQL statement in the warehouse database
+    elt = transform and os.getenv("TRANSFORM_MODE", "fused").lower() == "elt"
+
+    # Partitioned mode transforms car_sales by id_sales range in this many processes
+    workers = int(os.getenv("TRANSFORM_WORKERS", "1"))
+    partitioned = transform and workers > 1 and not (pushdown or elt or has_artifact("staging/car_sales"))
+
+    # The fused plan joins car_brand and us_state through cached key -> id indexes instead of merges
+    dimension_lookup = transform and os.getenv("DIMENSION_LOOKUP", "false").lower() == "true" \
+        and (pushdown or os.getenv("TRANSFORM_MODE", "fused").lower() == "fused")
 
  #---------------------------------EXTRACT DATABASE------------------------------------#
     print('-------------------Start Extracting Data-------------------')
-    df1 = extract_db_staging("car_sales")
-    df2 = extract_db_staging("car_brand")
-    df3 = extract_db_staging("us_state")
+    # Sketch mode profiles approximately in bounded memory, streaming mode always uses it.
+    # Incremental mode only profiles the rows added since the last run and merges them into the saved sketches.
+    profiling_mode = os.getenv("PROFILING_MODE", "exact").lower()
+    sketch_profiling = profile and (bool(chunksize) or profiling_mode in ("sketch", "incremental"))
+
+    # Incremental profiling extracts its own new rows, the other modes profile the raw car_sales stream
+    incremental_profiling = profile and profiling_mode == "incremental"
+    stream_profiling = profile and bool(chunksize) and not incremental_profiling
+
+    # Profiling needs the raw table, with pushdown the transform extracts its own filtered rows
+    extract_car_sales = (profile and not incremental_profiling) or (transform and not (pushdown or elt or partitioned))
+    df1 = None
+    if extract_car_sales:
+        df1 = extract_db_staging("car_sales", chunksize=chunksize)
+    if transform and not (elt or dimension_lookup):
+        df2 = extract_db_staging("car_brand")
+        df3 = extract_db_staging("us_state")
 
     print('-------------------Finish Extracting Data-------------------')
+
+    # The extract functions log their failure and return None
+    if extract_car_sales and df1 is None:
+        print("Extracting car_sales failed")
+        return False
+    if transform and not (elt or dimension_lookup) and (df2 is None or df3 is None):
+        print("Extracting car_brand / us_state failed")
+        return False
 #--------------------------------------------------------------------------------------#
 
 
 #---------------------------------PROFILING DATA---------------------------------------#
     print('-------------------Start Profiling Data-------------------')
 
-    df1_profiling = Profiling(data= df1, table_name="car_sales")
-    data_type = df1_profiling.get_columns()
-    duplicate_value_col = ["id_sales"]
-    unique_value_col = ["brand_car", "body", "transmission", "state", "color", "interior"]
-    missing_value_col = data_type
-    negative_value_col = ["year", "condition", "odometer", "mmr", "sellingprice"]
+    # Rows the profile is built from, only the new ones in incremental mode
+    df1_profile_rows = df1
+    if incremental_profiling:
+        df1_profiling = IncrementalProfiling(table_name="car_sales", key_column="id_sales")
+        query, params = df1_profiling.new_rows_query()
+        df1_profile_rows = extract_db_staging("car_sales", chunksize=chunksize, query=query, params=params)
+
+        if df1_profile_rows is None:
+            print("Extracting the new car_sales rows failed")
+            return False
 
-    df1_profiling.selected_columns(data_type, duplicate_value_col, unique_value_col, missing_value_col, negative_value_col)
-    df1_profiling.reporting()
+    if sketch_profiling and chunksize:
+        # Peek at the first chunk for the column names
+        first_chunk = next(df1_profile_rows, None)
+        if first_chunk is not None:
+            df1_profile_rows = itertools.chain([first_chunk], df1_profile_rows)
+
+    if not profile:
+        print('Profiling of car_sales not selected')
+    elif sketch_profiling and chunksize and first_chunk is None:
+        # Empty table, or no new rows since the last incremental profile: no report, the saved sketches are kept
+        print('No car_sales rows to profile')
+        stream_profiling = False
+    else:
+        if sketch_profiling:
+            columns = first_chunk.columns if chunksize else df1_profile_rows.columns
+
+            if incremental_profiling:
+                df1_profiling.list_columns = list(columns)
+            else:
+                df1_profiling = SketchProfiling(table_name="car_sales", columns=columns)
+        else:
+            df1_profiling = Profiling(data= df1, table_name="car_sales")
+
+        data_type = df1_profiling.get_columns()
+        duplicate_value_col = ["id_sales"]
+        unique_value_col = ["brand_car", "body", "transmission", "state", "color", "interior"]
+        missing_value_col = data_type
+        negative_value_col = ["year", "condition", "odometer", "mmr", "sellingprice"]
+
+        df1_profiling.selected_columns(data_type, duplicate_value_col, unique_value_col, missing_value_col, negative_value_col, top_k=10)
+
+        if stream_profiling:
+            # The sketches are updated while the chunks flow to the transform, the report comes after the load
+            df1 = df1_profiling.profile_stream(df1_profile_rows)
+        else:
+            if chunksize:
+                for chunk in df1_profile_rows:
+                    df1_profiling.update(chunk)
+            elif sketch_profiling:
+                df1_profiling.update(df1_profile_rows)
+            df1_profiling.reporting()
 
     print('-------------------Finish Profiling Data-------------------')
 #--------------------------------------------------------------------------------------#
 
+    if not transform or elt:
+        if stream_profiling:
+            for _ in df1:
+                pass
+            df1_profiling.reporting()
+
+    if not transform:
+        return True
+
+    if elt:
+        from src.warehouse.elt import elt_transform_load
+
+        print('-------------------Start ELT Transform & Load-------------------')
+
+        # The lookup tables are joined in the database, the plan only needs the steps
+        result = elt_transform_load(car_sales_plan(None, None), "car_sales", "car_sales", key_column="id_sales_nk")
+
+        print('-------------------Finish ELT Transform & Load-------------------')
+        return result is not None
+
 #---------------------------------Transform DATA---------------------------------------#
     print('-------------------Start Transforming Data-------------------')
 
-    df1_transform = Transformation(data=df1, table_name="car_sales")
-    df2_transform = Transformation(data=df2, table_name="car_brand")
-    df3_transform = Transformation(data=df3, table_name="us_state")
+    if dimension_lookup:
+        ## Lookup indexes of df2 (car_brand data, lower case brand_name) and df3 (us_state data)
+        df2_clean = DimensionLookup("car_brand", key_column="brand_name", id_column="brand_car_id")
+        df3_clean = DimensionLookup("us_state", key_column="code", id_column="id_state", lower_keys=False)
 
-    ## Transformation of df1 (car_sales data)
-    missing_value_col = ["odometer", "mmr", "condition"]
-    invalid_value_col = ["brand_car", "model", "trim", "body", "transmission", "vin", "state", "color", "interior", "seller"]
-    invalid_value = ["", "—","3vwd17aj5fm219943", "3vwd17aj5fm297123"]
-    to_lowercase_col = ["brand_car", "model", "trim", "body", "transmission", "color", "interior", "seller"]
+        for lookup in (df2_clean, df3_clean):
+            snapshot = None
+            if has_artifact(f"staging/{lookup.table_name}"):
+                try:
+                    snapshot = read_artifact(f"staging/{lookup.table_name}")
+                except Exception:
+                    print(f"Building the {lookup.table_name} lookup from the database instead of its snapshot")
 
-    df1_clean = df1_transform.drop_missing_value(missing_value_col)
-    df1_clean = df1_transform.drop_invalid_value(invalid_value_col, invalid_value)
-    df1_clean = df1_transform.to_lower_case(to_lowercase_col)
+            if snapshot is not None:
+                lookup.build(snapshot)
+            else:
+                lookup.load()
+    else:
+        df2_transform = Transformation(data=df2, table_name="car_brand")
+        df3_transform = Transformation(data=df3, table_name="us_state")
 
-    ## Transformation of df2 (car_brand data)
-    to_lowercase_col2 = ["brand_name"]
-    df2_clean = df2_transform.to_lower_case(to_lowercase_col2)
+        ## Transformation of df2 (car_brand data)
+        to_lowercase_col2 = ["brand_name"]
+        df2_clean = df2_transform.to_lower_case(to_lowercase_col2)
 
-    ## Transformation of df3 (us_state data)
-    to_lowercase_col3 = ["name"]
-    df3_clean = df3_transform.to_lower_case(to_lowercase_col3)
+        ## Transformation of df3 (us_state data)
+        to_lowercase_col3 = ["name"]
+        df3_clean = df3_transform.to_lower_case(to_lowercase_col3)
 
-    ## Merged Dataframe df1, df2 and df3
-    df1_clean = df1_transform.join_data(df2_clean, df3_clean)
+    if (pushdown or partitioned) and stream_profiling:
+        # The raw stream only feeds the profiling now
+        for _ in df1:
+            pass
 
-    # Select only necessary column based on data warehouse schema
-    df1_clean = df1_transform.select_merged_columns()
+    # Coerced / failed cast counts of all car_sales chunks or partitions
+    cast_report = {}
 
+    ## Transformation of df1 (car_sales data), chunk by chunk in streaming mode
+    if partitioned:
+        partitions = int(os.getenv("TRANSFORM_PARTITIONS", "0")) or None
+        df1_clean = transform_partitioned(df2_clean, df3_clean, workers, partitions, cast_report)
+    elif pushdown:
+        staging_columns = extract_db_staging("car_sales", query="select * from car_sales limit 0").columns
+        query, params, df1_plan = car_sales_plan(df2_clean, df3_clean).compile_sql("car_sales", list(staging_columns))
+        print(f"Pushed down to staging: {query}")
+        df1_plan.cast_report = cast_report
 
-    # Cast column based on data warehouse schema
-    df1_clean = df1_transform.cast_columns()
-
-    # Renaming column based on data warehouse schema
-    df1_clean = df1_transform.rename_columns()
+        df1 = extract_db_staging("car_sales", chunksize=chunksize, query=query, params=params)
+        if chunksize:
+            df1_clean = (df1_plan.execute(chunk) for chunk in df1)
+        else:
+            df1_clean = df1_plan.execute(df1)
+    elif chunksize:
+        df1_clean = (transform_car_sales(chunk, df2_clean, df3_clean, cast_report=cast_report) for chunk in df1)
+    else:
+        df1_clean = transform_car_sales(df1, df2_clean, df3_clean, cast_report=cast_report)
 
     print('-------------------Finish Transforming Data-------------------')
 
+    if df1_clean is None:
+        print("Transforming car_sales failed")
+        return False
+
 #--------------------------------------------------------------------------------------#
 
 
 #---------------------------------LOAD  DATA---------------------------------------#
     print('-------------------Start Loading Data to Warehouse-------------------')
 
-    load_to_warehouse(data=df1_clean, table_name="car_sales")
+    # The transformed rows are also snapshotted for the modelling stage
+    writer = ArtifactWriter("warehouse/car_sales") if artifacts_enabled() else None
+    if writer is not None:
+        df1_clean = writer.tap(df1_clean if chunksize or partitioned else [df1_clean])
+
+    loaded = load_to_warehouse(data=df1_clean, table_name="car_sales", method="upsert", key_column="id_sales_nk")
+
+    if writer is not None and loaded:
+        writer.commit()
+    elif writer is not None:
+        writer.abort()
 
     print('-------------------Finish Loading Data to Warehouse-------------------')
 
+    if cast_summary(cast_report):
+        print(f"Cast car_sales total: {cast_summary(cast_report)}")
+
+    if dimension_lookup:
+        df2_clean.report()
+        df3_clean.report()
+
+    if stream_profiling:
+        df1_profiling.reporting()
+
+    return loaded
+
 #--------------------------------------------------------------------------------------#
\ No newline at end of file
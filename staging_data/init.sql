@@ -30,3 +30,11 @@ CREATE TABLE public.car_sales (
 	created_at timestamp DEFAULT now() NULL,
 	CONSTRAINT car_sales_pk PRIMARY KEY (id_sales)
 );
+
+CREATE TABLE public.etl_watermark (
+	table_name varchar NOT NULL,
+	column_name varchar NOT NULL,
+	watermark varchar NULL,
+	updated_at timestamp DEFAULT now() NOT NULL,
+	CONSTRAINT etl_watermark_pk PRIMARY KEY (table_name)
+);
@@ -0,0 +1,48 @@
+import pandas as pd
+import numpy as np
+import tempfile
+import pytest
+import sys
+import os
+
+# Run from any directory: the modules are imported as src.<package>.<module>
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Without a log database the messages of the code under test go to a temporary file
+os.environ.setdefault("LOG_FALLBACK_PATH", os.path.join(tempfile.gettempdir(), "etl_log_tests.jsonl"))
+
+
+@pytest.fixture(scope="session")
+def car_prices():
+    """
+    Warehouse-like car_sales rows for training and scoring the car price model
+    """
+    rng = np.random.default_rng(1)
+    n = 800
+    data = pd.DataFrame({
+        "year": rng.integers(2000, 2015, n), "odometer": rng.uniform(0, 2e5, n), "condition": rng.uniform(1, 5, n),
+        "brand_car_id": rng.integers(1, 30, n), "transmission": rng.choice(["automatic", "manual"], n),
+        "color": rng.choice([f"c{i}" for i in range(12)], n), "mmr": rng.uniform(1e3, 5e4, n),
+    })
+    data["selling_price"] = data["mmr"] * 1.1 + rng.normal(0, 500, n)
+
+    return data
+
+
+@pytest.fixture(scope="session")
+def train_car_price_model(car_prices):
+    """
+    Train a small CarPriceModel, dense or sparse
+    """
+    from src.modelling.Car_Price_Model import CarPriceModel
+
+    def train(sparse: bool):
+        model = CarPriceModel(car_prices.copy(), sparse=sparse)
+        model.feature_engineering()
+        model.prepare_data()
+        model.scale_features()
+        model.split_data()
+        model.train_model(n_estimators=20)
+        return model
+
+    return train
@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor
+from src.modelling.batching import MicroBatcher
+import pytest
+
+
+def double(records):
+    return [record * 2 for record in records]
+
+
+def test_every_caller_gets_its_own_prediction():
+    calls = []
+
+    def predict(records):
+        calls.append(len(records))
+        return double(records)
+
+    with MicroBatcher(predict, max_batch_size=16, max_wait_ms=20) as batcher:
+        with ThreadPoolExecutor(32) as executor:
+            results = list(executor.map(batcher.predict, range(200)))
+
+    assert results == [record * 2 for record in range(200)]
+    assert sum(calls) == 200 and max(calls) <= 16
+    assert batcher.stats()["requests"] == 200
+
+
+def test_invalid_record_only_fails_its_caller():
+    def predict(records):
+        if "bad" in records:
+            raise ValueError("bad record")
+        return double(records)
+
+    with MicroBatcher(predict, max_wait_ms=50) as batcher:
+        futures = [batcher.submit(record) for record in (1, "bad", 3)]
+
+        assert futures[0].result(5) == 2
+        assert isinstance(futures[1].exception(5), ValueError)
+        assert futures[2].result(5) == 6
+
+    assert batcher.stats()["failed"] == 1
+
+
+@pytest.mark.parametrize("predict", [
+    lambda records: records[:-1],
+    lambda records: None,
+    lambda records: 1.0,
+])
+def test_wrong_number_of_predictions_fails_every_future(predict):
+    with MicroBatcher(predict, max_wait_ms=20) as batcher:
+        futures = [batcher.submit(record) for record in range(5)]
+
+        for future in futures:
+            assert isinstance(future.exception(5), (TypeError, ValueError))
+
+
+def test_partial_batch_is_scored_after_max_wait():
+    with MicroBatcher(double, max_batch_size=100, max_wait_ms=5) as batcher:
+        assert batcher.submit(21).result(5) == 42
+
+    assert batcher.stats()["batches"] == 1
+
+
+def test_submit_after_close_raises():
+    batcher = MicroBatcher(double)
+    batcher.close()
+
+    with pytest.raises(RuntimeError):
+        batcher.submit(1)
@@ -0,0 +1,18 @@
+from src.utils.bulk_load import upsert_statement
+
+
+def test_upsert_updates_only_changed_rows():
+    statement = upsert_statement("car_sales", ["id_sales_nk", "year", "color"], "id_sales_nk", '"tmp_car_sales"')
+
+    assert statement.startswith('INSERT INTO "car_sales" AS t ("id_sales_nk", "year", "color") '
+                                'SELECT DISTINCT ON ("id_sales_nk") "id_sales_nk", "year", "color" FROM "tmp_car_sales" s')
+    assert statement.endswith('ON CONFLICT ("id_sales_nk") DO UPDATE SET "year" = EXCLUDED."year", "color" = EXCLUDED."color" '
+                              'WHERE (t."year", t."color") IS DISTINCT FROM (EXCLUDED."year", EXCLUDED."color")')
+
+
+def test_upsert_of_the_key_only_skips_existing_keys():
+    statement = upsert_statement("car_brand", ["brand_car_id"], "brand_car_id", "(select 1 as brand_car_id)")
+
+    assert statement == ('INSERT INTO "car_brand" AS t ("brand_car_id") '
+                         'SELECT DISTINCT ON ("brand_car_id") "brand_car_id" FROM (select 1 as brand_car_id) s '
+                         'ORDER BY "brand_car_id" ON CONFLICT ("brand_car_id") DO NOTHING')
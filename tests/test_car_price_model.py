@@ -0,0 +1,31 @@
+from sklearn.ensemble import RandomForestRegressor
+import numpy as np
+
+
+def scoring_rows(car_prices):
+    rows = car_prices.drop(columns="selling_price").head(200).copy()
+    # Categories the model never saw are encoded as all zeros by both encodings
+    rows.loc[rows.index[:5], "color"] = "unseen"
+    rows.loc[rows.index[5:8], "transmission"] = ""
+    return rows
+
+
+def test_sparse_encoding_has_the_get_dummies_columns(train_car_price_model):
+    dense, sparse = train_car_price_model(False), train_car_price_model(True)
+    numeric, onehot = sparse.X_encoded
+
+    assert sparse.feature_names == list(dense.X_encoded.columns)
+    encoded = dense.X_encoded.astype(float).to_numpy()
+    np.testing.assert_array_equal(encoded[:, :numeric.shape[1]], numeric.to_numpy(dtype=float))
+    np.testing.assert_array_equal(encoded[:, numeric.shape[1]:], onehot.toarray())
+
+
+def test_sparse_encoding_predicts_like_dense(train_car_price_model, car_prices):
+    dense, sparse = train_car_price_model(False), train_car_price_model(True)
+    rows = scoring_rows(car_prices)
+
+    # sklearn's sparse splitter breaks ties between splits differently, so the forest is refit on the
+    # densified sparse matrix: same encoding, same forest, same predictions
+    sparse.model = RandomForestRegressor(n_estimators=20, random_state=42).fit(sparse.X_train.toarray(), sparse.y_train)
+
+    np.testing.assert_array_equal(sparse.predict(rows), dense.predict(rows))
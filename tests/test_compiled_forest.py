@@ -0,0 +1,56 @@
+from sklearn.ensemble import RandomForestRegressor
+from src.modelling import compiled_forest
+from src.modelling.compiled_forest import CompiledForest
+from scipy import sparse as sp
+import numpy as np
+import pytest
+
+
+@pytest.fixture(scope="module")
+def forest():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 6))
+    X[rng.random(X.shape) < 0.05] = np.nan
+    y = np.nan_to_num(X[:, 0]) * 3 + np.nan_to_num(X[:, 1]) ** 2 + rng.normal(size=400)
+
+    model = RandomForestRegressor(n_estimators=15, random_state=0).fit(X, y)
+    return model, X
+
+
+def test_predictions_are_bit_identical_to_sklearn(forest):
+    model, X = forest
+    compiled = CompiledForest.from_sklearn(model)
+
+    np.testing.assert_array_equal(compiled.predict(X), model.predict(X))
+
+
+def test_sparse_input_and_small_blocks(forest, monkeypatch):
+    model, X = forest
+    X = np.nan_to_num(X)
+    X[X < 0.5] = 0
+    monkeypatch.setattr(compiled_forest, "PREDICT_BLOCK_NODES", 100)
+
+    compiled = CompiledForest.from_sklearn(model)
+
+    np.testing.assert_array_equal(compiled.predict(sp.csr_matrix(X)), model.predict(X))
+
+
+def test_verify_raises_on_a_different_model(forest):
+    model, X = forest
+    compiled = CompiledForest.from_sklearn(model)
+
+    assert compiled.verify(model, X) == 0.0
+
+    compiled.value = compiled.value + 1
+    with pytest.raises(Exception, match="differs"):
+        compiled.verify(model, X)
+
+
+def test_wrong_feature_count_and_empty_input(forest):
+    model, X = forest
+    compiled = CompiledForest.from_sklearn(model)
+
+    with pytest.raises(ValueError):
+        compiled.predict(X[:, :3])
+
+    assert compiled.predict(X[:0]).shape == (0,)
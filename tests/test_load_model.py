@@ -0,0 +1,86 @@
+from src.modelling import load_model as lm
+import numpy as np
+import joblib
+import pytest
+import json
+
+
+@pytest.fixture
+def bucket(tmp_path):
+    """
+    Local stand-in bucket with two versions, the newer one with a checksum manifest
+    """
+    path = tmp_path / "bucket"
+    path.mkdir()
+
+    for version, scale in (("20261001_000000", 1.0), ("20261002_000000", 2.0)):
+        names = lm.artifact_names(version)
+        joblib.dump({"weights": np.arange(5) * scale}, path / names["model"])
+        joblib.dump({"scale": scale}, path / names["scaler"])
+        joblib.dump(["year", "odometer"], path / names["columns"])
+
+    names = lm.artifact_names("20261002_000000")
+    checksums = {name: lm.file_sha256(str(path / name)) for name in names.values()}
+    (path / lm.manifest_name("20261002_000000")).write_text(json.dumps({"sha256": checksums}))
+
+    return lm.LocalBucket(str(path))
+
+
+def test_local_bucket_lists_and_downloads(bucket, tmp_path):
+    assert "20261001_000000_car_price_model.pkl" in bucket.list_objects()
+
+    bucket.download("20261001_000000_scaler_car_price_model.pkl", str(tmp_path / "scaler.pkl"))
+
+    assert joblib.load(tmp_path / "scaler.pkl") == {"scale": 1.0}
+
+
+def test_resolve_version(bucket):
+    assert lm.resolve_version(bucket, "latest") == "20261002_000000"
+    assert lm.resolve_version(bucket, "20261001_000000") == "20261001_000000"
+
+    with pytest.raises(Exception, match="20261001_000000, 20261002_000000"):
+        lm.resolve_version(bucket, "20990101_000000")
+
+
+def test_fetch_artifact_rejects_a_checksum_mismatch(bucket, tmp_path):
+    with pytest.raises(Exception, match="Checksum mismatch"):
+        lm.fetch_artifact(bucket, "20261001_000000_car_price_model.pkl", expected_sha256="0" * 64,
+                          cache_path=str(tmp_path / "cache"))
+
+    # Nothing is cached, the temporary download is removed
+    assert not list((tmp_path / "cache" / "tmp").iterdir())
+    assert not (tmp_path / "cache" / "objects").exists()
+
+
+def test_cache_hit_skips_download_and_rehash(bucket, tmp_path, monkeypatch):
+    cache_path = str(tmp_path / "cache")
+    object_name = "20261002_000000_car_price_model.pkl"
+    first = lm.fetch_artifact(bucket, object_name, cache_path=cache_path)
+
+    hashed, downloaded = [], []
+    monkeypatch.setattr(lm, "file_sha256", lambda path: hashed.append(path))
+    monkeypatch.setattr(bucket, "download", lambda *args: downloaded.append(args))
+
+    assert lm.fetch_artifact(bucket, object_name, cache_path=cache_path) == first
+    assert hashed == [] and downloaded == []
+
+
+def test_corrupted_cache_is_downloaded_again_when_verified(bucket, tmp_path, monkeypatch):
+    cache_path = str(tmp_path / "cache")
+    object_name = "20261002_000000_car_price_model.pkl"
+    path = lm.fetch_artifact(bucket, object_name, cache_path=cache_path)
+    with open(path, "ab") as f:
+        f.write(b"corrupted")
+
+    monkeypatch.setattr(lm, "MODEL_VERIFY_CACHE", True)
+
+    assert lm.fetch_artifact(bucket, object_name, cache_path=cache_path) == path
+    assert lm.file_sha256(path) == lm.file_sha256(f"{bucket.path}/{object_name}")
+
+
+def test_load_model_from_local_bucket(bucket, tmp_path):
+    model, scaler, columns, version = lm.load_model("latest", bucket.path, str(tmp_path / "cache"))
+
+    assert version == "20261002_000000"
+    np.testing.assert_array_equal(model["weights"], np.arange(5) * 2.0)
+    assert scaler == {"scale": 2.0} and columns == ["year", "odometer"]
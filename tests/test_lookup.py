@@ -0,0 +1,26 @@
+from src.warehouse import lookup
+import src.warehouse.extract as extract
+import pandas as pd
+
+
+def test_key_renamed_in_place_rebuilds_the_cached_index(tmp_path, monkeypatch):
+    table = pd.DataFrame({"brand_name": ["Ford", "Kia"], "brand_car_id": [1, 2]})
+    fingerprints = []
+
+    def fingerprint(engine_name, table_name, watermark_column=None):
+        fingerprints.append(watermark_column)
+        # A checksum of every row: the same count and max id, but a different value after the rename
+        return {"table": f"{engine_name}.{table_name}", "rows": len(table), "value": str(hash(tuple(table["brand_name"])))}
+
+    monkeypatch.setattr(lookup, "table_fingerprint", fingerprint)
+    monkeypatch.setattr(extract, "extract_db_staging", lambda table_name, query=None, **kwargs: table.copy())
+    cache_path = str(tmp_path / "car_brand_lookup.json")
+
+    first = lookup.DimensionLookup("car_brand", "brand_name", "brand_car_id", cache_path=cache_path).load()
+    table.loc[1, "brand_name"] = "Hyundai"
+    second = lookup.DimensionLookup("car_brand", "brand_name", "brand_car_id", cache_path=cache_path).load()
+
+    assert list(first.keys) == ["ford", "kia"]
+    assert list(second.keys) == ["ford", "hyundai"]
+    # The full-table checksum, not a watermark column
+    assert fingerprints == [None, None]
@@ -0,0 +1,60 @@
+from src.warehouse import warehouse_pipeline as wp
+import pandas as pd
+import pytest
+
+
+def test_id_ranges_cover_every_id_once():
+    ranges = wp.id_ranges(3, 100, 7)
+
+    assert len(ranges) <= 7
+    assert [id_sales for start, end in ranges for id_sales in range(start, end)] == list(range(3, 101))
+
+
+def test_failed_extract_names_the_id_range(monkeypatch):
+    monkeypatch.setattr("src.warehouse.extract.extract_db_staging", lambda *args, **kwargs: None)
+
+    with pytest.raises(Exception, match=r"Extracting car_sales ids 10\.\.19 failed"):
+        wp._transform_partition((10, 20))
+
+
+def test_failed_transform_names_the_id_range(monkeypatch):
+    # Without the car_sales columns the fused plan logs its error and returns None
+    monkeypatch.setattr("src.warehouse.extract.extract_db_staging", lambda *args, **kwargs: pd.DataFrame({"x": [1]}))
+    monkeypatch.setattr(wp, "_partition_lookups", (pd.DataFrame(), pd.DataFrame()))
+
+    with pytest.raises(Exception, match=r"Transforming car_sales ids 10\.\.19 failed"):
+        wp._transform_partition((10, 20))
+
+
+def test_failed_partition_is_logged_as_a_failed_transform(monkeypatch):
+    class Connection:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            return False
+
+        def execute(self, query):
+            return self
+
+        def fetchone(self):
+            return 1, 100
+
+    class Engine:
+        def connect(self):
+            return Connection()
+
+    def process_map(func, items, *args, **kwargs):
+        raise Exception("Transforming car_sales ids 1..25 failed, see etl_log")
+        yield
+
+    logged = []
+    monkeypatch.setattr("src.utils.engine.init_engine", lambda name: Engine())
+    monkeypatch.setattr("src.utils.parallel.process_map", process_map)
+    monkeypatch.setattr("src.utils.load_log.LOAD_LOG", logged.append)
+
+    with pytest.raises(Exception, match=r"ids 1\.\.25"):
+        list(wp.transform_partitioned(pd.DataFrame(), pd.DataFrame(), workers=2))
+
+    assert [(log["component"], log["status"]) for log in logged] == [("Transformation (Partitioned)", "Failed!")]
+    assert "ids 1..25" in logged[0]["error_msg"]
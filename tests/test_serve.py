@@ -0,0 +1,47 @@
+from src.modelling.serve import Predictor
+import numpy as np
+import pytest
+
+
+def predictor_of(model):
+    columns = model.X_encoded.columns if not model.sparse else {
+        "feature_names": model.feature_names, "numeric_features": model.numeric_features,
+        "vocabulary": model.vocabulary}
+
+    return Predictor(model.model, model.scaler, columns, "test")
+
+
+@pytest.fixture
+def rows(car_prices):
+    rows = car_prices.drop(columns="selling_price").head(200).copy()
+    rows.loc[rows.index[:5], "color"] = "unseen"
+    rows.loc[rows.index[5:8], "transmission"] = ""
+    return rows
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_predict_matches_car_price_model(train_car_price_model, rows, sparse):
+    model = train_car_price_model(sparse)
+    predictor = predictor_of(model)
+    expected = model.predict(rows)
+
+    records = [{key: (value.item() if hasattr(value, "item") else value) for key, value in record.items()}
+               for record in rows.to_dict("records")]
+
+    np.testing.assert_array_equal(predictor.predict(records), expected)
+    np.testing.assert_array_equal(predictor.predict_frame(rows), expected)
+    # One record at a time keeps its one-hot column too
+    assert predictor.predict(records[:1]) == [expected[0]]
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_predict_frame_with_floats_and_categories(train_car_price_model, rows, sparse):
+    model = train_car_price_model(sparse)
+    predictor = predictor_of(model)
+    expected = model.predict(rows)
+
+    # Integer columns read as float (e.g. a nullable column from the warehouse) and dictionary-encoded strings
+    read_back = rows.astype({"year": float, "brand_car_id": float, "color": "category", "transmission": "category"})
+
+    np.testing.assert_array_equal(predictor.predict_frame(read_back), expected)
+    assert predictor.predict_frame(rows.head(0)).shape == (0,)
@@ -0,0 +1,73 @@
+from src.warehouse.sketches import ColumnSketch, CountMinTopK, HyperLogLog, Reservoir, hash_values
+import pandas as pd
+import numpy as np
+import json
+
+
+def test_hyperloglog_estimates_distinct_count_within_error():
+    hll = HyperLogLog(error_rate=0.01)
+    hll.update(hash_values(np.arange(50000)))
+
+    assert abs(hll.count() - 50000) / 50000 < 0.05
+
+
+def test_hyperloglog_merge_equals_single_pass():
+    values = np.arange(20000)
+    whole, left, right = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    whole.update(hash_values(values))
+    left.update(hash_values(values[:12000]))
+    right.update(hash_values(values[8000:]))
+
+    left.merge(right)
+
+    np.testing.assert_array_equal(left.registers, whole.registers)
+
+
+def test_count_min_top_k_finds_frequent_values():
+    values = np.array(["a", "b", "c", "d"], dtype=object)
+    counts = np.array([500, 300, 20, 10], dtype=np.int64)
+    sketch = CountMinTopK(k=2)
+    sketch.update(values, hash_values(values), counts)
+
+    top = sketch.top()
+
+    assert list(top) == ["a", "b"]
+    # Count-Min never underestimates
+    assert top["a"] >= 500 and top["b"] >= 300
+
+
+def test_reservoir_keeps_at_most_size_values_seen():
+    reservoir = Reservoir(size=5)
+    reservoir.update(np.arange(3))
+    reservoir.update(np.arange(3, 100))
+
+    assert reservoir.seen == 100
+    assert len(reservoir.sample) == 5
+    assert set(reservoir.sample) <= set(range(100))
+
+
+def test_column_sketch_chunks_match_one_pass():
+    values = pd.Series(["x", "y", None, "x", "z", "-1", "5"] * 100)
+    whole = ColumnSketch(numeric=True)
+    whole.update(values)
+
+    merged = ColumnSketch(numeric=True)
+    for start in range(0, len(values), 150):
+        part = ColumnSketch(numeric=True)
+        part.update(values[start:start + 150])
+        merged.merge(part)
+
+    assert (merged.count, merged.missing, merged.negative) == (whole.count, whole.missing, whole.negative) == (700, 100, 100)
+    assert (merged.minimum, merged.maximum) == (whole.minimum, whole.maximum) == (-1.0, 5.0)
+    assert merged.distinct() == whole.distinct() == 6
+
+
+def test_column_sketch_survives_json_round_trip():
+    sketch = ColumnSketch(numeric=True)
+    sketch.update(pd.Series(np.arange(-10, 1000)))
+
+    restored = ColumnSketch.from_dict(json.loads(json.dumps(sketch.to_dict())))
+
+    assert restored.to_dict() == sketch.to_dict()
+    assert restored.distinct() == sketch.distinct()
+    assert restored.frequent.top() == sketch.frequent.top()
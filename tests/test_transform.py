@@ -0,0 +1,135 @@
+from src.warehouse.transform import TransformationPlan, cast_frame
+from src.warehouse.warehouse_pipeline import transform_car_sales
+import pandas as pd
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def car_sales():
+    rng = np.random.default_rng(0)
+    n = 2000
+
+    def col(choices):
+        return rng.choice(choices, n)
+
+    return pd.DataFrame({
+        "id_sales": np.arange(n), "year": col(["2012", "2014", "x"]),
+        "brand_car": col(["Ford", "Kia", "BMW", "Tesla", "", "—"]), "model": col(["a", "B"]),
+        "trim": col(["t", ""]), "body": col(["Sedan", "SUV"]), "transmission": col(["automatic", "Manual", ""]),
+        "vin": col(["3vwd17aj5fm219943", "abc", "def"]), "state": col(["ca", "tx", "ny", "zz"]),
+        "condition": col(["4.5", "3", None]), "odometer": col(["1000", "20000.5", None]),
+        "color": col(["Red", "black"]), "interior": col(["Gray", "—"]), "seller": col(["s1", "S2"]),
+        "mmr": col(["1000", "2000"]), "sellingprice": col(["1500", "2500.5"]), "saledate": col(["x"]),
+    })
+
+
+@pytest.fixture
+def car_brand():
+    return pd.DataFrame({"brand_car_id": [1, 2, 3], "brand_name": ["ford", "kia", "bmw"], "created_at": ["a"] * 3})
+
+
+@pytest.fixture
+def us_state():
+    return pd.DataFrame({"id_state": [1, 2, 3], "code": ["ca", "tx", "ny"],
+                         "name": ["california", "texas", "new york"], "created_at": ["b"] * 3})
+
+
+def test_cast_frame_uses_compact_dtypes_and_reports_lost_values():
+    data = pd.DataFrame({"id_sales": ["1", "2", "3"], "year": ["2014", "x", "2015.5"],
+                         "odometer": ["10.5", None, "1e40"], "color": ["red", "blue", None]})
+    report = {}
+
+    result = cast_frame(data, report)
+
+    assert str(result["year"].dtype) == "Int32"
+    assert result["odometer"].dtype == np.float32
+    assert result["year"].tolist() == [2014, pd.NA, pd.NA]
+    assert result["odometer"].isna().tolist() == [False, True, True]
+    assert result["color"][:2].tolist() == ["red", "blue"] and result["color"].isna()[2]
+    # "x" is not a number, 2015.5 doesn't fit an integer and 1e40 doesn't fit a float32
+    assert report["year"] == {"coerced": 1, "failed": 1}
+    assert report["odometer"] == {"coerced": 0, "failed": 1}
+
+
+def test_cast_frame_adds_to_an_existing_report():
+    report = {"year": {"coerced": 2, "failed": 0}}
+
+    cast_frame(pd.DataFrame({"year": ["x", "2014"]}), report)
+
+    assert report["year"] == {"coerced": 3, "failed": 0}
+
+
+def test_fused_plan_matches_eager_steps(car_sales, car_brand, us_state):
+    eager_report, fused_report = {}, {}
+
+    eager = transform_car_sales(car_sales.copy(), car_brand, us_state, mode="eager", cast_report=eager_report)
+    fused = transform_car_sales(car_sales.copy(), car_brand, us_state, mode="fused", cast_report=fused_report)
+
+    assert len(fused) > 0
+    pd.testing.assert_frame_equal(eager.reset_index(drop=True), fused.reset_index(drop=True))
+    assert eager_report == fused_report
+
+
+def test_fused_plan_over_chunks_matches_one_pass(car_sales, car_brand, us_state):
+    whole = transform_car_sales(car_sales, car_brand, us_state, mode="fused")
+    chunks = pd.concat([transform_car_sales(car_sales[start:start + 500], car_brand, us_state, mode="fused")
+                        for start in range(0, len(car_sales), 500)])
+
+    pd.testing.assert_frame_equal(whole.reset_index(drop=True), chunks.reset_index(drop=True))
+
+
+def test_plan_rejects_steps_out_of_order():
+    with pytest.raises(Exception):
+        TransformationPlan("car_sales").cast_columns().drop_missing_value(["odometer"])
+
+
+def test_compile_sql_pushes_filters_lower_case_and_projection(car_brand, us_state):
+    from src.warehouse.warehouse_pipeline import car_sales_plan
+
+    columns = ["id_sales", "year", "brand_car", "model", "trim", "body", "transmission", "vin", "state", "condition",
+               "odometer", "color", "interior", "seller", "mmr", "sellingprice", "saledate"]
+
+    query, params, residual = car_sales_plan(car_brand, us_state).compile_sql("car_sales", columns)
+
+    assert '"odometer" IS NOT NULL' in query and '"condition" IS NOT NULL' in query
+    # NULL is not an invalid value, so a NOT IN must not drop it
+    assert 'coalesce("vin" NOT IN (' in query
+    assert sorted(params.values()) == sorted(["", "—", "3vwd17aj5fm219943", "3vwd17aj5fm297123"])
+    assert 'lower("color") AS "color"' in query and 'lower("brand_car") AS "brand_car"' in query
+    # Only the selected columns and the join keys are read
+    assert '"saledate"' not in query and '"seller"' not in query.split(" FROM ")[0]
+    assert '"brand_car"' in query and '"state"' in query
+    assert [step for step, _ in residual.steps] == ["join_data", "select_merged_columns", "cast_columns", "rename_columns"]
+
+
+def test_compile_sql_keeps_steps_it_cant_push_in_pandas(car_brand, us_state):
+    from src.warehouse.warehouse_pipeline import car_sales_plan
+
+    # Without a seller column the invalid value filter, and every step after it, stays in pandas
+    columns = ["id_sales", "year", "brand_car", "model", "trim", "body", "transmission", "vin", "state", "condition",
+               "odometer", "color", "interior", "mmr", "sellingprice"]
+
+    query, params, residual = car_sales_plan(car_brand, us_state).compile_sql("car_sales", columns)
+
+    assert '"odometer" IS NOT NULL' in query
+    assert "NOT IN" not in query and "lower(" not in query and params == {}
+    assert [step for step, _ in residual.steps][:2] == ["drop_invalid_value", "to_lower_case"]
+
+
+def test_compiled_query_gives_the_pandas_result(car_sales, car_brand, us_state):
+    import sqlite3
+    from src.warehouse.warehouse_pipeline import car_sales_plan
+
+    # Rows that pass every filter, but with a NULL vin
+    null_vin = car_sales_plan(car_brand, us_state).execute(car_sales.copy())["id_sales_nk"][:5].tolist()
+    car_sales.loc[car_sales["id_sales"].isin(null_vin), "vin"] = None
+    expected = car_sales_plan(car_brand, us_state).execute(car_sales.copy())
+
+    connection = sqlite3.connect(":memory:")
+    car_sales.astype(object).to_sql("car_sales", connection, index=False)
+    query, params, residual = car_sales_plan(car_brand, us_state).compile_sql("car_sales", list(car_sales.columns))
+    pushed = pd.read_sql(query, connection, params=params)
+
+    assert set(null_vin) <= set(pushed["id_sales"].astype(int))
+    pd.testing.assert_frame_equal(residual.execute(pushed).reset_index(drop=True), expected.reset_index(drop=True))